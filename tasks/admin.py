@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Task, Profile, Team, Category
+from .models import Task, Profile, Team, Category, OutboxMessage
+from .search import search_tasks
 
 
 # Register your models here.
@@ -10,6 +11,12 @@ class TaskAdmin(admin.ModelAdmin):
     list_display = ['title', 'assigned_to', 'due_date', 'status', 'team']
     list_filter = ['status', 'due_date', 'team']
     search_fields = ['title', 'description']
+
+    def get_search_results(self, request, queryset, search_term):
+        # zamiast icontains po kolumnach – indeks pełnotekstowy (search.py)
+        if not search_term:
+            return queryset, False
+        return search_tasks(queryset, search_term), False
     
 
 
@@ -28,4 +35,10 @@ class TeamAdmin(admin.ModelAdmin):
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name']
\ No newline at end of file
+    list_display = ['name']
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'available_at', 'created_at']
+    list_filter = ['kind', 'status']
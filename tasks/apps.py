@@ -5,5 +5,7 @@ class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
 
-def ready(self):
-    import tasks.signals
\ No newline at end of file
+    def ready(self):
+        import tasks.checks
+        import tasks.signals
+        import tasks.instrumentation
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def _load_user(user_id):
+    try:
+        return User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        # konto usunięte po wydaniu tokenu, zanim unieważnienie dotarło do cache
+        raise AuthenticationFailed("Użytkownik nie istnieje.", code='user_not_found')
+
+
+class LazyUser(SimpleLazyObject):
+    """request.user z tokenu JWT – User wczytywany z bazy dopiero przy pierwszym użyciu.
+
+    `pk`/`id` oraz flagi is_staff/is_superuser (z aktualnych claimów) nie wymagają
+    zapytania; każde inne pole lub porównanie z instancją User wczytuje użytkownika.
+    `__class__` zwraca User bez wczytywania, więc isinstance(request.user, User)
+    nie kosztuje zapytania (SimpleLazyObject pytałby o klasę wczytany obiekt).
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, token_context=None):
+        super().__init__(lambda: _load_user(user_id))
+        # bezpośrednio w __dict__ – LazyObject.__setattr__ przekazałby je do User
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_token_context'] = token_context
+
+    def __bool__(self):
+        return True
+
+    def _user_attribute(self, name):
+        if self._wrapped is empty:
+            self._setup()
+        return getattr(self._wrapped, name)
+
+    @property
+    def __class__(self):
+        return User
+
+    @property
+    def pk(self):
+        return self.__dict__['_user_id']
+
+    id = pk
+
+    @property
+    def is_staff(self):
+        context = self.__dict__['_token_context']
+        return context.is_staff if context is not None else self._user_attribute('is_staff')
+
+    @property
+    def is_superuser(self):
+        context = self.__dict__['_token_context']
+        return context.is_superuser if context is not None else self._user_attribute('is_superuser')
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication bez SELECT-a użytkownika na każde żądanie.
+
+    Unieważnione tokeny (także dezaktywowanych i usuniętych użytkowników)
+    odrzuca już ContextAccessToken.verify – lista w cache, patrz tokens.py.
+    Bez współdzielonego cache (AUTH_SHARED_CACHE=false) ta lista nie obejmuje
+    zmian z innych procesów, więc użytkownik jest wczytywany z bazy jak w simplejwt.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.AUTH_SHARED_CACHE:
+            return super().get_user(validated_token)
+        try:
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token nie zawiera identyfikatora użytkownika.")
+        get_context = getattr(validated_token, 'get_auth_context', None)
+        return LazyUser(user_id, get_context() if get_context else None)
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Kontekst autoryzacji (id, rola, zespół, flagi staff) liczony raz na żądanie.
+# Pochodzi z claimów tokenu JWT (tokens.py), a gdy ich brak lub są nieaktualne –
+# ze współdzielonego cache albo z bazy. Zapis Profile/User usuwa wpis w cache
+# (signals.py), więc zmiana roli działa od następnego żądania. Bez współdzielonego
+# cache (AUTH_SHARED_CACHE=false) kontekst zawsze pochodzi z bazy.
+
+
+class AuthContext:
+    __slots__ = ('user_id', 'role', 'team_id', 'is_staff', 'is_superuser')
+
+    def __init__(self, user_id, role, team_id, is_staff, is_superuser):
+        self.user_id = user_id
+        self.role = role
+        self.team_id = team_id
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+
+    @property
+    def has_profile(self):
+        return self.role is not None
+
+    @property
+    def is_manager(self):
+        return self.role == 'manager'
+
+    def as_tuple(self):
+        return (self.user_id, self.role, self.team_id, self.is_staff, self.is_superuser)
+
+
+def _key(user_id):
+    return f"tasks:authz:{user_id}"
+
+
+def load_auth_context(user_id):
+    """Kontekst z bazy – jedno zapytanie (użytkownik + profil).
+
+    Zawsze z bazy głównej: wynik trafia do cache i tokenów, a replika może być opóźniona.
+    """
+    user_id = User._meta.pk.to_python(user_id)
+    is_staff, is_superuser, role, team_id = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).values_list(
+        'is_staff', 'is_superuser', 'profile__role', 'profile__team_id'
+    ).first() or (False, False, None, None)
+    return AuthContext(user_id, role, team_id, is_staff, is_superuser)
+
+
+def get_auth_context(request):
+    """Kontekst bieżącego użytkownika: z żądania, z tokenu, z cache albo z bazy."""
+    context = getattr(request, '_auth_context', None)
+    if context is not None:
+        return context
+    if not settings.AUTH_SHARED_CACHE:
+        context = request._auth_context = load_auth_context(request.user.pk)
+        return context
+    token = request.auth
+    context = token.get_auth_context() if hasattr(token, 'get_auth_context') else None
+    if context is None:
+        user_id = request.user.pk
+        cached = cache.get(_key(user_id))
+        if cached is not None:
+            context = AuthContext(*cached)
+        else:
+            context = load_auth_context(user_id)
+            cache.set(_key(user_id), context.as_tuple(), timeout=settings.AUTH_CONTEXT_CACHE_TIMEOUT)
+    request._auth_context = context
+    return context
+
+
+def invalidate_auth_context(user_id):
+    cache.delete(_key(user_id))
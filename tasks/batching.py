@@ -0,0 +1,98 @@
+import weakref
+from contextlib import contextmanager
+
+from django.db import router, transaction
+from django.dispatch import Signal
+
+# wysyłany po zapisie paczki (bulk_create nie wysyła post_save); argument: objects
+# (dla Task także notify=False, gdy nadawca sam powiadamia przypisanych)
+bulk_created = Signal()
+# odpowiednik dla bulk_update; argumenty: objects, fields
+bulk_updated = Signal()
+
+
+class _DeferredCreates:
+    """Obiekty czekające na zapis zbiorczy na końcu bloku atomic_batch."""
+
+    def __init__(self, using):
+        self.using = using
+        self.objects = {}
+        self.flushed = False
+
+    def add(self, obj):
+        self.objects.setdefault(type(obj), []).append(obj)
+
+    def flush(self):
+        self.flushed = True
+        objects, self.objects = self.objects, {}
+        for model, batch in objects.items():
+            model.objects.using(self.using).bulk_create(batch)
+            bulk_created.send(sender=model, objects=batch)
+
+    def committed(self):
+        # callback on_commit tylko trzyma bufor przy życiu – zapis był w flush()
+        pass
+
+
+def _savepoint_buffer(name, factory, callback, using=None):
+    """Bufor jednego poziomu savepointu, żyjący tak długo jak jego callback on_commit.
+
+    Rollback savepointu (lub całej transakcji) usuwa callback, a z nim bufor –
+    słaba referencja w rejestrze wygasa i następne wywołanie zakłada nowy. Bufor
+    savepointu zatwierdzonego zostaje w on_commit z jego id, więc rollback
+    zewnętrznego bloku też go odrzuci.
+    """
+    connection = transaction.get_connection(using)
+    registry = getattr(connection, '_pending_on_commit', None)
+    if registry is None:
+        registry = connection._pending_on_commit = weakref.WeakValueDictionary()
+    key = (name, tuple(connection.savepoint_ids))
+    pending = registry.get(key)
+    if pending is None or pending.flushed:
+        pending = registry[key] = factory()
+        transaction.on_commit(callback(pending), using=using)
+    return pending
+
+
+def pending_on_commit(name, factory, using=None):
+    """Bufor z metodą flush() wywoływaną przy commicie – jeden na poziom savepointu."""
+    return _savepoint_buffer(name, factory, lambda pending: pending.flush, using=using)
+
+
+def flush_deferred(using=None):
+    """Zapisuje teraz, w bieżącej transakcji, wszystkie obiekty z defer_create."""
+    connection = transaction.get_connection(using)
+    registry = getattr(connection, '_pending_on_commit', None) or {}
+    for (name, _), pending in list(registry.items()):
+        if name == 'deferred_creates' and not pending.flushed:
+            pending.flush()
+
+
+@contextmanager
+def atomic_batch(using=None):
+    """transaction.atomic, w którym defer_create zbiera obiekty i zapisuje je
+    paczkami jako ostatnia instrukcja bloku – w tej samej transakcji co zmiana,
+    więc błąd zapisu wycofuje całość."""
+    connection = transaction.get_connection(using)
+    with transaction.atomic(using=using):
+        connection._batch_depth = getattr(connection, '_batch_depth', 0) + 1
+        try:
+            yield
+            flush_deferred(using)
+        finally:
+            connection._batch_depth -= 1
+
+
+def defer_create(obj, using=None):
+    """Zapisuje `obj` na końcu bieżącego bloku atomic_batch – razem z innymi, jednym bulk_create.
+
+    Poza atomic_batch obiekt jest zapisywany od razu (w bieżącej transakcji, jeśli jest).
+    """
+    using = using or router.db_for_write(type(obj))
+    connection = transaction.get_connection(using)
+    if not getattr(connection, '_batch_depth', 0):
+        obj.save(using=using)
+        return
+    _savepoint_buffer(
+        'deferred_creates', lambda: _DeferredCreates(using), lambda pending: pending.committed, using=using
+    ).add(obj)
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Kolejka zdarzeń jednego połączenia SSE, żyjąca w pętli zdarzeń serwera ASGI."""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # klient nie nadąża – gubimy zdarzenie, licznik i tak odświeży się przy połączeniu
+            pass
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Broker w pamięci procesu – wystarcza przy jednym workerze ASGI.
+
+    Przy wielu procesach podmień go (NOTIFICATION_BROKER) na implementację
+    z tym samym interfejsem opartą np. o Redis pub/sub.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event_type, data):
+        """Wysyła zdarzenie do wszystkich połączeń użytkownika (bezpieczne z dowolnego wątku)."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.deliver({"type": event_type, "data": data})
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.NOTIFICATION_BROKER)()
+    return _broker
+
+
+def publish_notifications(notifications):
+    """Nowe powiadomienia + przyrost licznika nieprzeczytanych dla ich adresatów."""
+    from .serializers import NotificationSerializer
+
+    broker = get_broker()
+    unread = {}
+    for notification in notifications:
+        broker.publish(notification.user_id, "notification", NotificationSerializer(notification).data)
+        if not notification.is_read:
+            unread[notification.user_id] = unread.get(notification.user_id, 0) + 1
+    for user_id, delta in unread.items():
+        publish_unread_delta(user_id, delta)
+
+
+def publish_unread_delta(user_id, delta):
+    if delta:
+        get_broker().publish(user_id, "unread_delta", {"delta": delta})
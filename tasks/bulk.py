@@ -0,0 +1,168 @@
+from django.contrib.contenttypes.models import ContentType
+from taggit.models import Tag, TaggedItem
+
+from .batching import atomic_batch, bulk_created, bulk_updated
+from .models import Task
+from .outbox import enqueue_task_created
+from .serializers import BulkOperationSerializer, BulkTaskSerializer
+from .versions import bump_version_on_commit
+
+# Operacje zbiorcze na zadaniach (POST /api/tasks/bulk/).
+#
+# Walidacja całej paczki w jednym przebiegu: zadania i obiekty powiązane są
+# wczytywane po jednym zapytaniu na model. Walidacja i zapis idą w jednej
+# transakcji, a zmieniane zadania są zablokowane (select_for_update) – bulk_update
+# zapisuje sumę zmienionych pól i nie może nadpisać równoległej zmiany.
+# Tagi zapisywane są wierszami TaggedItem (bulk_create), jak w importer.py.
+# Log zmian, powiadomienia, liczniki i indeks wyszukiwania aktualizują się
+# paczkami: receivery bulk_created/bulk_updated w signals.py oraz defer_create.
+
+
+def _result(index, op, task_id=None, errors=None):
+    result = {"index": index, "op": op, "id": task_id, "status": "error" if errors else "ok"}
+    if errors:
+        result["errors"] = errors
+    return result
+
+
+def _preload_related(payloads):
+    """Obiekty wskazane przez pola `*_id` wszystkich operacji – jedno zapytanie na model."""
+    wanted = {}
+    for payload in payloads:
+        for field, model in BulkTaskSerializer.RELATED_FIELDS.items():
+            try:
+                wanted.setdefault(model, set()).add(int(payload[field]))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return {model: model.objects.in_bulk(ids) for model, ids in wanted.items()}
+
+
+def _validate(operations, request, visible_tasks):
+    """Zwraca (wyniki z błędami, create, update, delete); każda operacja trafia do dokładnie jednej grupy."""
+    results = {}
+    envelopes = []
+    for index, item in enumerate(operations):
+        envelope = BulkOperationSerializer(data=item)
+        if envelope.is_valid():
+            envelopes.append((index, envelope.validated_data))
+        else:
+            op = item.get("op") if isinstance(item, dict) else None
+            results[index] = _result(index, op, errors=envelope.errors)
+
+    tasks = visible_tasks.select_for_update().in_bulk({envelope["id"] for _, envelope in envelopes if "id" in envelope})
+    context = {
+        "request": request,
+        "preloaded": _preload_related(envelope["data"] for _, envelope in envelopes if "data" in envelope),
+    }
+
+    creates, updates, deletes = [], [], []
+    seen = set()
+    for index, envelope in envelopes:
+        op, task_id = envelope["op"], envelope.get("id")
+        if op != "create":
+            task = tasks.get(task_id)
+            if task is None:
+                results[index] = _result(index, op, task_id, {"id": ["Nie znaleziono zadania."]})
+                continue
+            if task_id in seen:
+                results[index] = _result(index, op, task_id, {"id": ["Zadanie występuje w paczce więcej niż raz."]})
+                continue
+            seen.add(task_id)
+            if op == "delete":
+                deletes.append((index, task))
+                continue
+        serializer = BulkTaskSerializer(
+            tasks.get(task_id), data=envelope["data"], partial=op == "update", context=context
+        )
+        if not serializer.is_valid():
+            results[index] = _result(index, op, task_id, serializer.errors)
+            continue
+        (creates if op == "create" else updates).append((index, serializer))
+    return results, creates, updates, deletes
+
+
+def _tag_ids(tag_lists):
+    """Id tagów dla wszystkich nazw w paczce; brakujące tworzone raz na nazwę."""
+    names = {name for names in tag_lists for name in names}
+    ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    for name in sorted(names - ids.keys()):
+        ids[name] = Tag.objects.create(name=name).pk
+    return ids
+
+
+def _save_tags(task_tags, replace):
+    """Tagi zadań jednym bulk_create zamiast task.tags.set() dla każdego zadania.
+
+    `task_tags` – pary (zadanie, nazwy); None oznacza brak zmiany tagów.
+    """
+    task_tags = [(task, names) for task, names in task_tags if names is not None]
+    if not task_tags:
+        return
+    content_type = ContentType.objects.get_for_model(Task)
+    if replace:
+        TaggedItem.objects.filter(
+            content_type=content_type, object_id__in=[task.pk for task, _ in task_tags]
+        ).delete()
+    ids = _tag_ids(names for _, names in task_tags)
+    TaggedItem.objects.bulk_create([
+        TaggedItem(content_type=content_type, object_id=task.pk, tag_id=ids[name])
+        for task, names in task_tags
+        for name in dict.fromkeys(names)
+    ])
+    # bulk_create nie wysyła sygnałów TaggedItem (signals.tag_generation_changed)
+    bump_version_on_commit('tag')
+
+
+def _apply_creates(creates):
+    tasks, tags = [], []
+    for _, serializer in creates:
+        data = serializer.apply_status_rules(dict(serializer.validated_data))
+        tags.append(data.pop("tags", None))
+        tasks.append(Task(**data))
+    Task.objects.bulk_create(tasks)
+    _save_tags(zip(tasks, tags), replace=False)
+    bulk_created.send(sender=Task, objects=tasks)
+    enqueue_task_created(tasks)
+    return tasks
+
+
+def _apply_updates(updates):
+    tasks, tags, fields = [], [], set()
+    for _, serializer in updates:
+        task = serializer.instance
+        data = serializer.apply_status_rules(dict(serializer.validated_data))
+        serializer.log_changes(task, data)
+        tags.append(data.pop("tags", None))
+        for attr, value in data.items():
+            setattr(task, attr, value)
+        fields.update(data)
+        tasks.append(task)
+    if fields:
+        # wiersze zablokowane w _validate – pola spoza zmian tego zadania mają wartości z bazy
+        Task.objects.bulk_update(tasks, sorted(fields))
+    _save_tags(zip(tasks, tags), replace=True)
+    bulk_updated.send(sender=Task, objects=tasks, fields=fields)
+    for task in tasks:
+        task.remember_saved_values(fields)
+    return tasks
+
+
+def run_bulk_operations(operations, request, visible_tasks):
+    """Wykonuje paczkę operacji (lista z BulkRequestSerializer); zwraca wyniki w kolejności wejścia.
+
+    Operacje z błędami są pomijane, pozostałe wykonywane razem w jednej transakcji.
+    """
+    with atomic_batch():
+        results, creates, updates, deletes = _validate(operations, request, visible_tasks)
+        if creates:
+            for (index, _), task in zip(creates, _apply_creates(creates)):
+                results[index] = _result(index, "create", task.pk)
+        if updates:
+            for (index, _), task in zip(updates, _apply_updates(updates)):
+                results[index] = _result(index, "update", task.pk)
+        if deletes:
+            # kaskada i post_delete (liczniki, indeks) jak przy pojedynczym DELETE
+            Task.objects.filter(pk__in=[task.pk for _, task in deletes]).delete()
+            for index, task in deletes:
+                results[index] = _result(index, "delete", task.pk)
+    return [results[index] for index in range(len(operations))]
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+def _local_cache():
+    backend = settings.CACHES['default']['BACKEND']
+    return backend if backend in settings.LOCAL_CACHE_BACKENDS else None
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """Unieważnienia tokenów (wylogowanie, dezaktywacja) są zapisywane w cache –
+    cache w pamięci procesu widzi tylko proces, który je zapisał."""
+    backend = _local_cache()
+    # przy replikach zgłasza to już replica_cache_check
+    if backend is None or settings.DATABASE_REPLICAS:
+        return []
+    return [Error(
+        f"CACHE_BACKEND={backend} nie jest współdzielony między procesami.",
+        hint="Ustaw CACHE_BACKEND/CACHE_LOCATION na Redis lub Memcached – inaczej wylogowanie "
+             "i unieważnienie tokenów działają tylko w procesie, który je obsłużył.",
+        id='tasks.E001',
+    )]
+
+
+@register(Tags.caches, Tags.database)
+def replica_cache_check(app_configs, **kwargs):
+    """Przypięcie do bazy głównej po zapisie (routers.pin_to_primary) jest w cache –
+    inny proces go nie widzi i następny odczyt idzie do opóźnionej repliki."""
+    backend = _local_cache()
+    if backend is None or not settings.DATABASE_REPLICAS:
+        return []
+    return [Error(
+        f"CACHE_BACKEND={backend} nie jest współdzielony między procesami, a DATABASE_REPLICAS są ustawione.",
+        hint="Ustaw CACHE_BACKEND/CACHE_LOCATION na Redis lub Memcached – inaczej użytkownik po zapisie "
+             "może czytać z repliki bez swoich zmian, a wylogowanie działa tylko w jednym procesie.",
+        id='tasks.E001',
+    )]
@@ -0,0 +1,81 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import TaskCounter
+
+# pola Task (attname) tworzące klucz licznika
+KEY_FIELDS = ('team_id', 'assigned_to_id', 'status', 'priority', 'completed')
+GROUP_FIELDS = ('status', 'priority', 'completed')
+
+
+def task_key(task):
+    return tuple(getattr(task, field) for field in KEY_FIELDS)
+
+
+def loaded_task_key(task):
+    """Klucz z migawki wczytanej z bazy (None dla zadania spoza bazy)."""
+    if not hasattr(task, '_loaded_values'):
+        return None
+    return tuple(task.get_loaded_value(field, getattr(task, field)) for field in KEY_FIELDS)
+
+
+def _counter_filter(key):
+    team_id, assignee_id, status, priority, completed = key
+    return {
+        'team_id': team_id,
+        'assignee_id': assignee_id,
+        'status': status,
+        'priority': priority,
+        'completed': completed,
+    }
+
+
+def add_to_counter(key, delta):
+    lookup = _counter_filter(key)
+    if TaskCounter.objects.filter(**lookup).update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            TaskCounter.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # ktoś utworzył wiersz równolegle
+        TaskCounter.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def move_task(old_key, new_key):
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        add_to_counter(old_key, -1)
+    if new_key is not None:
+        add_to_counter(new_key, 1)
+
+
+def move_tasks(moves):
+    """move_task dla wielu zadań naraz – jedna aktualizacja na każdy zmieniony klucz.
+
+    `moves` to pary (stary klucz, nowy klucz).
+    """
+    deltas = Counter()
+    for old_key, new_key in moves:
+        if old_key == new_key:
+            continue
+        if old_key is not None:
+            deltas[old_key] -= 1
+        if new_key is not None:
+            deltas[new_key] += 1
+    for key, delta in deltas.items():
+        if delta:
+            add_to_counter(key, delta)
+
+
+def summarize(counters, group_by=('status',)):
+    """Sumy liczników w podanym przekroju, bez pustych grup."""
+    return (
+        counters.values(*group_by)
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by(*group_by)
+    )
@@ -0,0 +1,150 @@
+import csv
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from taggit.models import Tag
+from taggit.utils import edit_string_for_tags
+
+from .models import Task, TaskLog
+
+# Eksport strumieniowy (CSV / NDJSON) zadań i historii zmian.
+#
+# Wiersze czytane są paczkami przez .iterator(chunk_size=...) – na PostgreSQL
+# kursorem po stronie serwera – więc pamięć nie rośnie z rozmiarem tabeli.
+# Zakres eksportu zamykany jest na starcie najwyższym id. Kolejny przyrostowy
+# eksport zaczyna od `after_id=<watermark>` albo od `since`.
+#
+# Id nadawane jest przy INSERT, a widoczne po COMMIT, więc wiersz o niższym id
+# może pojawić się po wierszu o wyższym. Watermark to dlatego najwyższe id wśród
+# wierszy starszych niż EXPORT_WATERMARK_OVERLAP_SECONDS – świeższe wiersze
+# trafią też do następnego eksportu (odbiorca usuwa duplikaty po id). Pominięty
+# może zostać tylko wiersz z transakcji dłuższej niż ten zapas.
+
+
+class TaskExport:
+    columns = [
+        'id', 'title', 'description',
+        'assigned_to_id', 'assigned_to', 'team_id', 'team', 'category_id', 'category',
+        'status', 'priority', 'completed', 'due_date', 'created_at', 'tags',
+    ]
+    timestamp_field = 'created_at'
+
+    def get_queryset(self):
+        return Task.objects.select_related('assigned_to', 'team', 'category').prefetch_related('tags')
+
+    def row(self, task):
+        return [
+            task.id, task.title, task.description,
+            task.assigned_to_id, task.assigned_to.username,
+            task.team_id, task.team.name,
+            task.category_id, task.category.name if task.category else None,
+            task.status, task.priority, task.completed, task.due_date, task.created_at,
+            sorted(tag.name for tag in task.tags.all()),
+        ]
+
+
+class TaskLogExport:
+    columns = ['id', 'task_id', 'user_id', 'user', 'change_type', 'old_value', 'new_value', 'timestamp']
+    timestamp_field = 'timestamp'
+
+    def get_queryset(self):
+        # bez instancji modelu – krotki prosto z kursora
+        return TaskLog.objects.values_list(
+            'id', 'task_id', 'user_id', 'user__username', 'change_type', 'old_value', 'new_value', 'timestamp'
+        )
+
+    def row(self, values):
+        return list(values)
+
+
+EXPORTS = {
+    'tasks': TaskExport(),
+    'logs': TaskLogExport(),
+}
+
+
+def parse_watermarks(since=None, after_id=None):
+    """`since` (ISO 8601) i `after_id` z tekstu; ValueError przy złym formacie."""
+    if since:
+        parsed = parse_datetime(since)
+        if parsed is None:
+            raise ValueError("since: oczekiwano daty w formacie ISO 8601.")
+        since = parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    else:
+        since = None
+    if after_id not in (None, ''):
+        try:
+            after_id = int(after_id)
+        except (TypeError, ValueError):
+            raise ValueError("after_id: oczekiwano liczby całkowitej.")
+    else:
+        after_id = None
+    return since, after_id
+
+
+def prepare_export(dataset, since=None, after_id=None):
+    """Zwraca (export, queryset, watermark).
+
+    Queryset obejmuje wiersze do najwyższego id na starcie, watermark – najwyższe id
+    wierszy starszych niż EXPORT_WATERMARK_OVERLAP_SECONDS (albo `after_id`, gdy brak).
+    """
+    export = EXPORTS[dataset]
+    queryset = export.get_queryset()
+    if since is not None:
+        queryset = queryset.filter(**{f'{export.timestamp_field}__gte': since})
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    last_id = queryset.aggregate(last_id=Max('id'))['last_id']
+    if last_id is None:
+        return export, queryset.none(), after_id
+    settled = timezone.now() - timedelta(seconds=settings.EXPORT_WATERMARK_OVERLAP_SECONDS)
+    watermark = queryset.filter(
+        id__lte=last_id, **{f'{export.timestamp_field}__lte': settled}
+    ).aggregate(watermark=Max('id'))['watermark']
+    return export, queryset.filter(id__lte=last_id).order_by('id'), after_id if watermark is None else watermark
+
+
+def iter_rows(export, queryset, chunk_size=None):
+    for obj in queryset.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE):
+        yield export.row(obj)
+
+
+class _Echo:
+    """Pseudo-plik dla csv.writer – zwraca linię zamiast ją buforować."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        # zapis taggit: nazwy z przecinkiem lub spacją w cudzysłowie (importer czyta go parse_tags)
+        return edit_string_for_tags([Tag(name=name) for name in value])
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', csv_lines),
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+}
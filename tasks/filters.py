@@ -0,0 +1,103 @@
+import django_filters
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import Task
+from .options import priority_options, status_options
+from .search import search_tasks
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Lista wartości po przecinku, np. `?status__in=todo,in_progress`."""
+
+
+class TaskFilter(django_filters.FilterSet):
+    """Filtry listy zadań.
+
+    Najczęstsze kombinacje (zespół + status + termin, przypisany + zakończone + termin)
+    mają indeksy złożone na Task.
+    """
+    due_date__gte = django_filters.IsoDateTimeFilter(field_name='due_date', lookup_expr='gte')
+    due_date__lte = django_filters.IsoDateTimeFilter(field_name='due_date', lookup_expr='lte')
+    status__in = CharInFilter(field_name='status', lookup_expr='in')
+    priority__in = CharInFilter(field_name='priority', lookup_expr='in')
+    tags__name__in = CharInFilter(field_name='tags__name', lookup_expr='in', distinct=True)
+    assignee = django_filters.NumberFilter(field_name='assigned_to_id')
+    completed = django_filters.BooleanFilter(method='filter_completed')
+
+    class Meta:
+        model = Task
+        fields = ['completed', 'team', 'due_date', 'status', 'category', 'priority']
+
+    def filter_completed(self, queryset, name, value):
+        # `completed=False` Django zapisuje jako `NOT completed`. PostgreSQL sam zamienia
+        # to na `completed = false` i używa indeksu (assigned_to, completed, due_date),
+        # SQLite nie – wtedy szuka tylko po assigned_to. `IN (false)` trafia w indeks
+        # w obu bazach (test_common_filters_use_composite_indexes).
+        return queryset.filter(completed__in=[value])
+
+
+class TaskSearchFilter(BaseFilterBackend):
+    """`?q=` – wyszukiwanie pełnotekstowe po tytule, opisie i komentarzach.
+
+    Wyniki są posortowane od najlepiej dopasowanych (patrz TaskOrderingFilter).
+    """
+    search_param = 'q'
+
+    @classmethod
+    def get_search_query(cls, request):
+        return request.query_params.get(cls.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query:
+            return queryset
+        return search_tasks(queryset, query, **view.get_search_scope())
+
+
+class TaskOrderingFilter(OrderingFilter):
+    """`?ordering=due_date,-priority` – sortowanie listy zadań.
+
+    CursorPagination bierze kolejność z tego filtra, dlatego zawsze dokładamy `id`
+    jako rozstrzygnięcie remisów. Bez `?ordering=` wyniki wyszukiwania idą od
+    najlepiej dopasowanych, a zwykła lista – domyślnie z paginacji.
+
+    `status` i `priority` sortują według kolejności ze słowników (rejestry
+    options.py – bez zapytań o opcje): pozycja z Case(When(...)). Mają po kilka
+    wartości, więc remisy kursor DRF przechodzi offsetem, a `id` na końcu
+    ustala kolejność w ich obrębie.
+    """
+    ordering_fields = ['due_date', 'created_at', 'priority', 'status', 'title']
+    option_registries = {'status': status_options, 'priority': priority_options}
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if params:
+            fields = [param.strip() for param in params.split(',')]
+            ordering = [
+                f'{field}_order' if field.lstrip('-') in self.option_registries else field
+                for field in self.remove_invalid_fields(queryset, fields, view, request)
+            ]
+            if ordering:
+                return (*ordering, '-id' if ordering[-1].startswith('-') else 'id')
+        if TaskSearchFilter.get_search_query(request):
+            return ('-search_rank', '-id')
+        return None
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        for field in ordering:
+            name = field.lstrip('-').removesuffix('_order')
+            if name in self.option_registries:
+                queryset = queryset.annotate(**{f'{name}_order': self.option_order(name)})
+        return queryset.order_by(*ordering)
+
+    def option_order(self, name):
+        values = self.option_registries[name].ordered()
+        return Case(
+            *[When(**{name: value}, then=Value(index)) for index, value in enumerate(values)],
+            default=Value(len(values)),
+            output_field=IntegerField(),
+        )
@@ -1,8 +1,40 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
 from django.conf import settings
+from django.utils import timezone
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from .models import GoogleCredentials, TaskCalendarEvent
+
+logger = logging.getLogger(__name__)
+
+# LRU zbudowanych klientów Calendar, osobne dla każdego wątku
+# (httplib2.Http pod spodem nie jest bezpieczne wątkowo)
+_local = threading.local()
+
+
+def _service_cache():
+    cache = getattr(_local, "services", None)
+    if cache is None:
+        cache = _local.services = OrderedDict()
+    return cache
+
+
+def clear_service_cache():
+    _service_cache().clear()
+
 
-from .models import GoogleCredentials
+def credentials_to_dict(creds):
+    """Słownik do zapisania w GoogleCredentials.credentials_json (razem z expiry)."""
+    return json.loads(creds.to_json())
 
 def get_user_google_credentials(user):
     try:
@@ -12,10 +44,159 @@ def get_user_google_credentials(user):
 
     return Credentials.from_authorized_user_info(obj.credentials_json)
 
+
+def _store_refreshed_credentials(obj, creds):
+    """Zapisuje odświeżony token, żeby kolejne procesy nie odświeżały go ponownie."""
+    obj.credentials_json = credentials_to_dict(creds)
+    obj.updated_at = timezone.now()
+    GoogleCredentials.objects.filter(pk=obj.pk).update(
+        credentials_json=obj.credentials_json,
+        updated_at=obj.updated_at,
+    )
+
+
 def get_calendar_service(user):
-    creds = get_user_google_credentials(user)
-    if not creds:
+    try:
+        obj = user.google_credentials
+    except GoogleCredentials.DoesNotExist:
         return None
-    # refresh tokenów, jeśli wygasły – google-auth robi to automatycznie,
-    # ale w razie czego można dodać ręczną obsługę expiry.
-    return build("calendar", "v3", credentials=creds)
+
+    cache = _service_cache()
+    key = (user.pk, obj.updated_at)
+    entry = cache.get(key)
+    if entry is None:
+        # starsze wersje poświadczeń tego użytkownika nie będą już użyte
+        for stale in [k for k in cache if k[0] == user.pk]:
+            del cache[stale]
+        creds = Credentials.from_authorized_user_info(obj.credentials_json)
+        # statyczny dokument discovery z paczki – build() nie idzie do sieci
+        service = build(
+            "calendar", "v3",
+            credentials=creds,
+            static_discovery=True,
+            cache_discovery=False,
+        )
+        entry = (service, creds)
+    else:
+        cache.pop(key)
+    service, creds = entry
+
+    stored_token = obj.credentials_json.get("token")
+    if not creds.valid and creds.refresh_token:
+        try:
+            creds.refresh(Request())
+        except RefreshError as exc:
+            # refresh token odwołany lub wygasły – konto trzeba połączyć ponownie;
+            # wpis nie wraca do cache
+            logger.warning("Nie udało się odświeżyć tokenu Google użytkownika %s: %s", user.pk, exc)
+            return None
+    if creds.token != stored_token:
+        # token odświeżony tutaj albo w tle przez klienta HTTP
+        _store_refreshed_credentials(obj, creds)
+        key = (user.pk, obj.updated_at)
+
+    cache[key] = entry
+    while len(cache) > settings.GOOGLE_SERVICE_CACHE_SIZE:
+        cache.popitem(last=False)
+    return service
+
+def build_task_event_body(task):
+    """Treść wydarzenia Google Calendar dla zadania (godzina od terminu)."""
+    # zakładam, że due_date to DateTimeField
+    start_iso = task.due_date.isoformat()
+    # kończymy np. godzinę później
+    end_iso = (task.due_date + timedelta(hours=1)).isoformat()
+    return {
+        "summary": task.title,
+        "description": task.description or "",
+        "start": {
+            "dateTime": start_iso,
+            "timeZone": "Europe/Warsaw",  # ewentualnie z settings.TIME_ZONE
+        },
+        "end": {
+            "dateTime": end_iso,
+            "timeZone": "Europe/Warsaw",
+        },
+    }
+
+
+def task_event_request(service, task, event_id=""):
+    """Żądanie insert albo patch – zależnie od tego, czy zadanie ma już wydarzenie w tym kalendarzu."""
+    body = build_task_event_body(task)
+    if event_id:
+        return service.events().patch(calendarId="primary", eventId=event_id, body=body)
+    return service.events().insert(calendarId="primary", body=body)
+
+
+def _event_gone(exception):
+    return getattr(getattr(exception, "resp", None), "status", None) in (404, 410)
+
+
+def sync_task_event(service, user, task):
+    """Wysyła wydarzenie jednego zadania do kalendarza użytkownika; zwraca (event, created).
+
+    Wydarzenie usunięte w kalendarzu (404/410) jest tworzone od nowa.
+    """
+    event_id = TaskCalendarEvent.objects.filter(task=task, user=user).values_list("event_id", flat=True).first() or ""
+    try:
+        event = task_event_request(service, task, event_id).execute()
+    except HttpError as exc:
+        if not event_id or not _event_gone(exc):
+            raise
+        event_id = ""
+        event = task_event_request(service, task).execute()
+    if event.get("id") and event["id"] != event_id:
+        TaskCalendarEvent.objects.update_or_create(task=task, user=user, defaults={"event_id": event["id"]})
+    return event, not event_id
+
+
+def sync_tasks_to_calendar(service, user, tasks, chunk_size=None):
+    """Wysyła wydarzenia zadań do kalendarza użytkownika paczkami (Google batch HTTP)
+    i zapamiętuje ich id dla pary zadanie–użytkownik.
+
+    Zwraca listę wyników per zadanie: created / updated / error.
+    """
+    chunk_size = chunk_size or settings.GOOGLE_CALENDAR_BATCH_SIZE
+    tasks = list(tasks)
+    event_ids = dict(
+        TaskCalendarEvent.objects.filter(user=user, task__in=tasks).values_list("task_id", "event_id")
+    )
+    results = []
+    changed = {}
+    gone = []
+
+    for start in range(0, len(tasks), chunk_size):
+        chunk = {str(task.pk): task for task in tasks[start:start + chunk_size]}
+
+        def callback(request_id, response, exception):
+            task = chunk[request_id]
+            event_id = event_ids.get(task.pk, "")
+            if exception is not None:
+                if event_id and _event_gone(exception):
+                    # wydarzenie usunięte w kalendarzu – następna synchronizacja utworzy nowe
+                    gone.append(task.pk)
+                results.append({"task_id": task.pk, "status": "error", "detail": str(exception)})
+                return
+            if response.get("id") and response["id"] != event_id:
+                changed[task.pk] = response["id"]
+            results.append({
+                "task_id": task.pk,
+                "status": "updated" if event_id else "created",
+                "event_id": response.get("id") or event_id,
+            })
+
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, task in chunk.items():
+            batch.add(task_event_request(service, task, event_ids.get(task.pk, "")), request_id=request_id)
+        batch.execute()
+
+    if gone:
+        TaskCalendarEvent.objects.filter(user=user, task_id__in=gone).delete()
+    if changed:
+        TaskCalendarEvent.objects.bulk_create(
+            [TaskCalendarEvent(task_id=task_id, user=user, event_id=event_id) for task_id, event_id in changed.items()],
+            update_conflicts=True,
+            unique_fields=["task", "user"],
+            update_fields=["event_id"],
+        )
+    return results
@@ -0,0 +1,285 @@
+import codecs
+import csv
+import io
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from taggit.models import Tag, TaggedItem
+from taggit.utils import parse_tags
+
+from .batching import atomic_batch, bulk_created, defer_create
+from .models import Category, Notification, Task, Team
+from .options import priority_options, status_options
+
+# Import strumieniowy zadań z CSV / NDJSON (format taki jak w export.py).
+#
+# Plik czytany jest wiersz po wierszu. Użytkownicy, zespoły, kategorie i tagi
+# rozwiązywane są przez słowniki wczytane raz na cały import. Zadania zapisywane
+# są paczkami bulk_create, każda paczka w osobnej transakcji. Import nie wysyła
+# e-maili ani nie synchronizuje kalendarza (to zadania historyczne).
+
+MAX_REPORTED_ERRORS = 100
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # błąd zgłaszany przy wierszu, nie przerywa importu
+                yield None
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def text_stream(binary):
+    """Plik binarny (np. UploadedFile) jako strumień tekstu UTF-8, bez wczytywania całości."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def text_lines(request):
+    """Surowa treść żądania jako linie tekstu UTF-8 – czytane z gniazda w trakcie importu.
+
+    HttpRequest nie jest plikiem dla TextIOWrapper (brak readable()), ale iteruje
+    się po liniach; linia nigdy nie przecina znaku UTF-8.
+    """
+    return codecs.iterdecode(request, 'utf-8-sig')
+
+
+class LookupMaps:
+    """Słowniki nazwa/id -> id budowane raz na import."""
+
+    def __init__(self):
+        self.user_ids = set()
+        self.usernames = {}
+        for pk, username in User.objects.values_list('id', 'username'):
+            self.user_ids.add(pk)
+            self.usernames[username] = pk
+        self.team_ids, self.team_names = self._by_name(Team)
+        self.category_ids, self.category_names = self._by_name(Category)
+        self.tags = dict(Tag.objects.values_list('name', 'id'))
+
+    @staticmethod
+    def _by_name(model):
+        ids, names = set(), {}
+        for pk, name in model.objects.values_list('id', 'name'):
+            ids.add(pk)
+            # nazwa występująca kilka razy jest niejednoznaczna
+            names[name] = None if name in names else pk
+        return ids, names
+
+    @staticmethod
+    def _resolve(label, row, ids, names, required=True):
+        raw_id = row.get(f'{label}_id')
+        if raw_id not in (None, ''):
+            try:
+                pk = int(raw_id)
+            except (TypeError, ValueError):
+                raise RowError(f"{label}_id: oczekiwano liczby.")
+            if pk not in ids:
+                raise RowError(f"{label}_id: nie istnieje ({pk}).")
+            return pk
+        name = row.get(label)
+        if name in (None, ''):
+            if required:
+                raise RowError(f"{label}: pole wymagane.")
+            return None
+        if name not in names:
+            raise RowError(f"{label}: nie istnieje ({name}).")
+        if names[name] is None:
+            raise RowError(f"{label}: niejednoznaczna nazwa ({name}), podaj {label}_id.")
+        return names[name]
+
+    def user(self, row):
+        return self._resolve('assigned_to', row, self.user_ids, self.usernames)
+
+    def team(self, row):
+        return self._resolve('team', row, self.team_ids, self.team_names)
+
+    def category(self, row):
+        return self._resolve('category', row, self.category_ids, self.category_names, required=False)
+
+    def tag_ids(self, names, created):
+        """Id tagów; brakujące są tworzone (raz na import), ich nazwy trafiają do `created`."""
+        for name in names:
+            if name not in self.tags:
+                # Tag.save dba o unikalny slug
+                self.tags[name] = Tag.objects.create(name=name).pk
+                created.append(name)
+        return [self.tags[name] for name in names]
+
+    def forget_tags(self, names):
+        # tagi utworzone w wycofanej paczce nie istnieją w bazie
+        for name in names:
+            del self.tags[name]
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (None, ''):
+        return False
+    if str(value).lower() in ('true', '1', 'yes', 'tak'):
+        return True
+    if str(value).lower() in ('false', '0', 'no', 'nie'):
+        return False
+    raise RowError("completed: oczekiwano true/false.")
+
+
+def _parse_tags(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        # jak w export.py: `api, "front, back"`
+        value = parse_tags(value)
+    if not isinstance(value, list):
+        raise RowError("tags: oczekiwano listy lub tekstu z przecinkami.")
+    return sorted({str(tag).strip() for tag in value if str(tag).strip()})
+
+
+def build_task(row, lookups):
+    """Wiersz pliku -> (niezapisany Task, nazwy tagów); RowError przy błędnych danych."""
+    if not isinstance(row, dict):
+        raise RowError("Nieprawidłowy wiersz.")
+
+    title = (row.get('title') or '').strip()
+    if not title:
+        raise RowError("title: pole wymagane.")
+    if len(title) > Task._meta.get_field('title').max_length:
+        raise RowError("title: za długi tytuł.")
+
+    due_date = row.get('due_date')
+    try:
+        due_date = parse_datetime(due_date) if due_date else None
+    except ValueError:
+        due_date = None
+    if due_date is None:
+        raise RowError("due_date: oczekiwano daty w formacie ISO 8601.")
+    if timezone.is_naive(due_date):
+        due_date = timezone.make_aware(due_date)
+
+    status = row.get('status') or 'todo'
+    if status not in status_options:
+        raise RowError(f"status: nieznany status ({status}).")
+    priority = row.get('priority') or 'medium'
+    if priority not in priority_options:
+        raise RowError(f"priority: nieznany priorytet ({priority}).")
+
+    task = Task(
+        title=title,
+        description=row.get('description') or '',
+        assigned_to_id=lookups.user(row),
+        team_id=lookups.team(row),
+        category_id=lookups.category(row),
+        due_date=due_date,
+        status=status,
+        priority=priority,
+        completed=status == 'done' or _parse_bool(row.get('completed')),
+    )
+    return task, _parse_tags(row.get('tags'))
+
+
+class TaskImporter:
+    """Import jednego pliku.
+
+    `notify='rows'` – powiadomienie o każdym zadaniu (jak przy POST /api/tasks/),
+    `notify='summary'` – jedno podsumowanie na osobę przypisaną,
+    `notify='none'` – bez powiadomień.
+    """
+    NOTIFY_CHOICES = ('rows', 'summary', 'none')
+
+    def __init__(self, notify='rows', batch_size=None):
+        if notify not in self.NOTIFY_CHOICES:
+            raise ValueError(f"notify: dozwolone wartości to {', '.join(self.NOTIFY_CHOICES)}.")
+        self.notify = notify
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.lookups = LookupMaps()
+        self.content_type = ContentType.objects.get_for_model(Task)
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.failed = 0
+        self.per_assignee = {}
+        self.elapsed = 0.0
+
+    def run(self, rows):
+        started = time.monotonic()
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            self.rows += 1
+            try:
+                batch.append(build_task(row, self.lookups))
+            except RowError as exc:
+                self.failed += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({"row": line, "error": str(exc)})
+                continue
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        if self.notify == 'summary':
+            self._notify_summary()
+        self.elapsed = time.monotonic() - started
+        return self
+
+    def _flush(self, batch):
+        tasks = [task for task, _ in batch]
+        new_tags = []
+        try:
+            with atomic_batch():
+                Task.objects.bulk_create(tasks)
+                TaggedItem.objects.bulk_create([
+                    TaggedItem(content_type_id=self.content_type.pk, object_id=task.pk, tag_id=tag_id)
+                    for task, names in batch
+                    for tag_id in self.lookups.tag_ids(names, new_tags)
+                ])
+                # liczniki i indeks wyszukiwania paczką (signals.tasks_bulk_created)
+                bulk_created.send(sender=Task, objects=tasks, notify=self.notify == 'rows')
+        except Exception:
+            self.lookups.forget_tags(new_tags)
+            raise
+        self.created += len(tasks)
+        for task in tasks:
+            self.per_assignee[task.assigned_to_id] = self.per_assignee.get(task.assigned_to_id, 0) + 1
+
+    def _notify_summary(self):
+        with atomic_batch():
+            for user_id, count in self.per_assignee.items():
+                defer_create(Notification(
+                    user_id=user_id,
+                    message=f"Zaimportowano zadania przypisane do Ciebie: {count}.",
+                ))
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
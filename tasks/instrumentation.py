@@ -0,0 +1,288 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import response_cache
+from .middleware import compression_stats
+
+# Pomiary żądań: widok/akcja, liczba zapytań SQL, czas SQL, powtórzone
+# zapytania i czas całego żądania.
+#
+# Zapytania liczy execute wrapper zakładany raz na połączenie (connection_created);
+# żądanie bez pomiaru (polecenia, zadania w tle) omija go jednym ContextVar.get.
+# Wyniki trafiają do nagłówka Server-Timing, logu "tasks.requests" i liczników
+# dla /metrics. Liczniki zbierane są w pamięci procesu i co
+# REQUEST_METRICS_FLUSH_SECONDS dopisywane do współdzielonego cache, więc
+# /metrics pokazuje sumę ze wszystkich workerów (z takim opóźnieniem).
+
+logger = logging.getLogger('tasks.requests')
+
+_recorder = ContextVar('tasks_query_recorder', default=None)
+
+PREFIX = 'teammanager'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+HANDLERS_KEY = 'tasks:metrics:handlers'
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+
+
+class QueryRecorder:
+    """Zapytania jednego żądania; powtórzenie = ten sam SQL (bez parametrów), typowo N+1."""
+
+    __slots__ = ('started', 'queries', 'duplicates', 'sql_time', '_seen')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.duplicates = 0
+        self.sql_time = 0.0
+        self._seen = set()
+
+    def add(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        if sql in self._seen:
+            self.duplicates += 1
+        else:
+            self._seen.add(sql)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # execute_wrappers przeżywają ponowne połączenie tego samego aliasu
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def handler_label(request):
+    """`TaskViewSet.list`, `BootstrapView.get`, nazwa widoku funkcyjnego albo `other`."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'other'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    # dowolna metoda HTTP nie może tworzyć nowych etykiet
+    action = actions.get(method) or (method if method in view_class.http_method_names else 'other')
+    return f"{view_class.__name__}.{action}"
+
+
+def _key(handler, field):
+    return f"tasks:metrics:{handler}:{field}"
+
+
+def _add(key, delta):
+    if not cache.add(key, delta, timeout=None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # licznik wyrzucony z cache między add a incr
+            pass
+
+
+class _PendingCounters:
+    """Przyrosty liczników od ostatniego zapisu do cache (jeden obiekt na proces)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deltas = {}
+        self.handlers = set()
+        self.flushed_at = time.monotonic()
+
+    def record(self, handler, status_code, duration, recorder):
+        bucket = bisect.bisect_left(settings.REQUEST_METRICS_BUCKETS, duration)
+        fields = (
+            ('requests', 1),
+            (f'status:{status_code // 100}xx', 1),
+            (f'bucket:{bucket}', 1),
+            ('duration_us', int(duration * 1_000_000)),
+            ('queries', recorder.queries),
+            ('duplicates', recorder.duplicates),
+            ('sql_us', int(recorder.sql_time * 1_000_000)),
+        )
+        with self.lock:
+            self.handlers.add(handler)
+            for field, value in fields:
+                key = _key(handler, field)
+                self.deltas[key] = self.deltas.get(key, 0) + value
+            due = time.monotonic() - self.flushed_at >= settings.REQUEST_METRICS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, {}
+            handlers = set(self.handlers)
+            self.flushed_at = time.monotonic()
+        known = cache.get(HANDLERS_KEY) or set()
+        if not handlers <= known:
+            # wyścig workerów najwyżej na chwilę gubi etykietę – kolejny zapis ją przywraca
+            cache.set(HANDLERS_KEY, known | handlers, timeout=None)
+        for key, delta in deltas.items():
+            if delta:
+                _add(key, delta)
+
+
+_pending = _PendingCounters()
+
+
+def server_timing(duration, recorder):
+    queries = f"{recorder.queries} queries, {recorder.duplicates} duplicated"
+    return f'db;dur={recorder.sql_time * 1000:.2f};desc="{queries}", app;dur={duration * 1000:.2f}'
+
+
+def _log(request, response, handler, duration, recorder):
+    level = logging.WARNING if duration * 1000 >= settings.SLOW_REQUEST_MS else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    fields = {
+        'handler': handler,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'queries': recorder.queries,
+        'duplicates': recorder.duplicates,
+        'sql_ms': round(recorder.sql_time * 1000, 2),
+    }
+    # logfmt w treści; te same pola w `request_metrics` dla formatterów JSON
+    logger.log(level, ' '.join(f'{name}={value}' for name, value in fields.items()), extra={'request_metrics': fields})
+
+
+class RequestMetricsMiddleware:
+    """Mierzy każde żądanie (sync i async). Dla odpowiedzi strumieniowych
+    czas i zapytania liczone są do wysłania nagłówków, bez treści strumienia."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder):
+        duration = time.perf_counter() - recorder.started
+        handler = handler_label(request)
+        if settings.SERVER_TIMING:
+            response.headers['Server-Timing'] = server_timing(duration, recorder)
+        _log(request, response, handler, duration, recorder)
+        _pending.record(handler, response.status_code, duration, recorder)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+    lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+
+def render_metrics():
+    """Liczniki wszystkich workerów w formacie tekstowym Prometheusa."""
+    _pending.flush()
+    handlers = sorted(cache.get(HANDLERS_KEY) or ())
+    buckets = settings.REQUEST_METRICS_BUCKETS
+    fields = ['requests', 'duration_us', 'queries', 'duplicates', 'sql_us']
+    fields += [f'status:{status_class}' for status_class in STATUS_CLASSES]
+    fields += [f'bucket:{index}' for index in range(len(buckets) + 1)]
+    found = cache.get_many([_key(handler, field) for handler in handlers for field in fields])
+
+    def value(handler, field):
+        return found.get(_key(handler, field), 0)
+
+    lines = []
+    _family(lines, 'http_request_duration_seconds', 'histogram', "Czas obsługi żądania.")
+    for handler in handlers:
+        cumulative = 0
+        for index, bound in enumerate([*buckets, '+Inf']):
+            cumulative += value(handler, f'bucket:{index}')
+            le = bound if bound == '+Inf' else repr(float(bound))
+            lines.append(f"{PREFIX}_http_request_duration_seconds_bucket{_labels(handler=handler, le=le)} {cumulative}")
+        lines.append(f"{PREFIX}_http_request_duration_seconds_sum{_labels(handler=handler)} {value(handler, 'duration_us') / 1e6}")
+        lines.append(f"{PREFIX}_http_request_duration_seconds_count{_labels(handler=handler)} {value(handler, 'requests')}")
+
+    _family(lines, 'http_responses_total', 'counter', "Odpowiedzi według klasy statusu.")
+    for handler in handlers:
+        for status_class in STATUS_CLASSES:
+            count = value(handler, f'status:{status_class}')
+            if count:
+                lines.append(f"{PREFIX}_http_responses_total{_labels(handler=handler, status=status_class)} {count}")
+
+    for name, field, help_text in (
+        ('db_queries_total', 'queries', "Zapytania SQL."),
+        ('db_duplicate_queries_total', 'duplicates', "Powtórzone zapytania SQL (ten sam SQL w jednym żądaniu)."),
+    ):
+        _family(lines, name, 'counter', help_text)
+        for handler in handlers:
+            lines.append(f"{PREFIX}_{name}{_labels(handler=handler)} {value(handler, field)}")
+    _family(lines, 'db_query_duration_seconds_total', 'counter', "Czas zapytań SQL.")
+    for handler in handlers:
+        lines.append(f"{PREFIX}_db_query_duration_seconds_total{_labels(handler=handler)} {value(handler, 'sql_us') / 1e6}")
+
+    _family(lines, 'response_cache_requests_total', 'counter', "Odczyty cache odpowiedzi (response_cache.py).")
+    for name, outcomes in response_cache.stats(['task-list', 'task-retrieve']).items():
+        for outcome, count in outcomes.items():
+            lines.append(f"{PREFIX}_response_cache_requests_total{_labels(name=name, outcome=outcome)} {count}")
+
+    compression = compression_stats()
+    for name, field, help_text in (
+        ('compressed_responses_total', 'responses', "Skompresowane odpowiedzi."),
+        ('compression_original_bytes_total', 'original', "Bajty odpowiedzi przed kompresją."),
+        ('compression_sent_bytes_total', 'compressed', "Bajty odpowiedzi po kompresji."),
+    ):
+        _family(lines, name, 'counter', help_text)
+        for endpoint, row in compression.items():
+            lines.append(f"{PREFIX}_{name}{_labels(endpoint=endpoint)} {row[field]}")
+    return '\n'.join(lines) + '\n'
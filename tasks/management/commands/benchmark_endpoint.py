@@ -0,0 +1,88 @@
+import io
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks.tokens import ContextRefreshToken
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mierzy czas odpowiedzi endpointu (p50/p99) w procesie, przez pełny stos WSGI – "
+        "z request_started/request_finished, więc połączenia z bazą zachowują się jak pod "
+        "serwerem (CONN_MAX_AGE, pula psycopg)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="/api/me/", help="Ścieżka z opcjonalnym query string.")
+        parser.add_argument("--user", default=None, help="Nazwa użytkownika (domyślnie pierwszy superużytkownik).")
+        parser.add_argument("--requests", type=int, default=500, help="Liczba mierzonych żądań.")
+        parser.add_argument("--warmup", type=int, default=20, help="Żądania rozgrzewające (niemierzone).")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options["user"]) if options["user"] else \
+            User.objects.filter(is_superuser=True).order_by("pk")
+        user = users.first()
+        if user is None:
+            raise CommandError("Brak użytkownika – podaj --user albo utwórz superużytkownika.")
+        if options["requests"] < 1:
+            raise CommandError("--requests musi być dodatnie.")
+
+        url = urlsplit(options["path"])
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost",
+            "HTTP_AUTHORIZATION": f"Bearer {ContextRefreshToken.for_user(user).access_token}",
+            "wsgi.url_scheme": "http",
+            "wsgi.errors": self.stderr,
+        }
+        # polecenie trzyma połączenie otwarte – zamykamy je, żeby pomiar zaczynał jak worker
+        connections.close_all()
+
+        handler = WSGIHandler()
+        statuses = set()
+
+        def start_response(status, headers):
+            statuses.add(status)
+
+        def request():
+            response = handler(dict(environ, **{"wsgi.input": io.BytesIO()}), start_response)
+            b"".join(response)
+            # jak serwer WSGI: close() wysyła request_finished -> close_old_connections
+            response.close()
+
+        for _ in range(options["warmup"]):
+            request()
+        samples = []
+        for _ in range(options["requests"]):
+            started = time.perf_counter()
+            request()
+            samples.append((time.perf_counter() - started) * 1000)
+
+        database = settings.DATABASES["default"]
+        pool = database.get("OPTIONS", {}).get("pool")
+        self.stderr.write(
+            f"{database['ENGINE'].rsplit('.', 1)[-1]}: CONN_MAX_AGE={database.get('CONN_MAX_AGE', 0)}, "
+            f"CONN_HEALTH_CHECKS={database.get('CONN_HEALTH_CHECKS', False)}, pool={pool or 'brak'}; "
+            f"odpowiedzi: {', '.join(sorted(statuses))}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"GET {options['path']} × {len(samples)}: p50 {percentile(samples, 0.5):.2f} ms, "
+            f"p99 {percentile(samples, 0.99):.2f} ms, średnio {statistics.mean(samples):.2f} ms"
+        ))
@@ -0,0 +1,97 @@
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from tasks import renderers
+from tasks.renderers import ORJSONParser, ORJSONRenderer
+
+
+def task_rows(count, datetimes):
+    """Wiersze jak z listy zadań; `datetimes=True` – obiekty datetime (ścieżki z .values())."""
+    now = timezone.now()
+    team = {'id': 1, 'name': "Zespół projektowy", 'members': list(range(1, 13))}
+    rows = []
+    for i in range(count):
+        due_date = now + timedelta(hours=i, microseconds=i)
+        rows.append({
+            'id': i + 1,
+            'title': f"Zadanie {i}: przygotować raport",
+            'description': "Opis zadania z polskimi znakami – zażółć gęślą jaźń. " * 3,
+            'assigned_to': {'id': i % 12 + 1, 'username': f"uzytkownik{i % 12}", 'role': 'employee'},
+            'team': team,
+            'due_date': due_date if datetimes else due_date.isoformat().replace('+00:00', 'Z'),
+            'completed': i % 3 == 0,
+            'status': ('todo', 'in_progress', 'done')[i % 3],
+            'category': {'id': i % 5 + 1, 'name': f"Kategoria {i % 5}"} if i % 4 else None,
+            'priority': ('low', 'medium', 'high')[i % 3],
+            'tags': ['api', f"tag{i % 7}"],
+        })
+    return {'next': None, 'previous': None, 'results': rows}
+
+
+def log_rows(count):
+    now = timezone.now()
+    return [
+        {
+            'id': i + 1,
+            'task': i // 3 + 1,
+            'user': i % 12 + 1,
+            'change_type': 'status',
+            'old_value': 'todo',
+            'new_value': 'in_progress',
+            'timestamp': now - timedelta(minutes=i, microseconds=i),
+            'duration': Decimal('1.25') * i,
+        }
+        for i in range(count)
+    ]
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Mikrobenchmark JSON API: JSONRenderer/JSONParser DRF vs ORJSONRenderer/ORJSONParser."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Wierszy w jednym dokumencie.")
+        parser.add_argument("--repeat", type=int, default=20, help="Powtórzeń (liczy się najlepsze).")
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson nie jest zainstalowany – ORJSONRenderer używa zwykłego json.")
+        rows, repeat = options["rows"], options["repeat"]
+        payloads = {
+            "zadania (daty jako tekst)": task_rows(rows, datetimes=False),
+            "zadania (datetime)": task_rows(rows, datetimes=True),
+            "logi (datetime, Decimal)": log_rows(rows),
+        }
+        for name, data in payloads.items():
+            expected = JSONRenderer().render(data)
+            actual = ORJSONRenderer().render(data)
+            if actual != expected:
+                raise CommandError(f"{name}: ORJSONRenderer daje inny wynik niż JSONRenderer.")
+            results = [
+                ("render", _best(lambda: JSONRenderer().render(data), repeat),
+                 _best(lambda: ORJSONRenderer().render(data), repeat)),
+                ("parse", _best(lambda: JSONParser().parse(io.BytesIO(expected)), repeat),
+                 _best(lambda: ORJSONParser().parse(io.BytesIO(expected)), repeat)),
+            ]
+            self.stdout.write(f"{name} – {rows} wierszy, {len(expected) / 1024:.0f} KiB, identyczny wynik:")
+            for operation, slow, fast in results:
+                self.stdout.write(
+                    f"  {operation}: json {rows / slow:,.0f} wierszy/s, orjson {rows / fast:,.0f} wierszy/s "
+                    f"(×{slow / fast:.1f})"
+                )
@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from taggit.models import Tag, TaggedItem
+
+from tasks.models import Category, Task, Team
+from tasks.serializers import TASK_LIST_VALUES, TaskSerializer, task_list_rows
+
+
+def _serializer_path(ids):
+    tasks = Task.objects.filter(pk__in=ids).select_related(
+        'assigned_to__profile', 'team', 'category'
+    ).prefetch_related(
+        Prefetch('team__members', queryset=User.objects.only('id')),
+        'tags',
+    ).order_by('-created_at', '-id')
+    return JSONRenderer().render(TaskSerializer(tasks, many=True).data)
+
+
+def _values_path(ids):
+    rows = list(Task.objects.filter(pk__in=ids).values(*TASK_LIST_VALUES).order_by('-created_at', '-id'))
+    return JSONRenderer().render(task_list_rows(rows))
+
+
+class Command(BaseCommand):
+    help = (
+        "Porównuje liczbę wierszy/s listy zadań: TaskSerializer vs task_list_rows (.values()), "
+        "od zapytania do gotowego JSON-a. Brakujące zadania tworzy tymczasowo (wycofane po pomiarze)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Wierszy w jednej odpowiedzi.")
+        parser.add_argument("--repeat", type=int, default=5, help="Powtórzeń każdej ścieżki (liczy się najlepsze).")
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1 or options["repeat"] < 1:
+            raise CommandError("--rows i --repeat muszą być dodatnie.")
+        with transaction.atomic():
+            ids = self._task_ids(options["rows"])
+            results = {}
+            for name, path in (("TaskSerializer", _serializer_path), ("task_list_rows", _values_path)):
+                best = None
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    content = path(ids)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                results[name] = (best, content)
+                self.stdout.write(f"{name}: {len(ids) / best:,.0f} wierszy/s ({best * 1000:.1f} ms)")
+            transaction.set_rollback(True)
+
+        (slow, expected), (fast, actual) = results.values()
+        if actual != expected:
+            raise CommandError("Wynik task_list_rows różni się od TaskSerializer.")
+        self.stdout.write(self.style.SUCCESS(f"Identyczny JSON, przyspieszenie ×{slow / fast:.1f}"))
+
+    def _task_ids(self, count):
+        ids = list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True)[:count])
+        missing = count - len(ids)
+        if missing:
+            self.stderr.write(f"Tworzę tymczasowo {missing} zadań.")
+            ids += self._create_tasks(missing)
+        return ids
+
+    def _create_tasks(self, count):
+        team = Team.objects.create(name="Benchmark")
+        users = [User.objects.create_user(username=f"benchmark-{i}") for i in range(10)]
+        team.members.add(*users)
+        categories = [Category.objects.create(name=f"Benchmark {i}") for i in range(5)]
+        tags = [Tag.objects.create(name=f"benchmark-{i}") for i in range(20)]
+        now = timezone.now()
+        tasks = Task.objects.bulk_create([
+            Task(
+                title=f"Zadanie {i}",
+                description=f"Opis zadania {i}",
+                assigned_to=users[i % len(users)],
+                team=team,
+                category=categories[i % len(categories)] if i % 4 else None,
+                due_date=now + timedelta(hours=i),
+            )
+            for i in range(count)
+        ])
+        content_type = ContentType.objects.get_for_model(Task)
+        TaggedItem.objects.bulk_create([
+            TaggedItem(content_type=content_type, object_id=task.pk, tag=tags[(i + offset) % len(tags)])
+            for i, task in enumerate(tasks)
+            for offset in range(3)
+        ])
+        return [task.pk for task in tasks]
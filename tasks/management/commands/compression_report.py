@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from tasks.middleware import compression_stats
+
+
+class Command(BaseCommand):
+    help = "Bajty zaoszczędzone przez kompresję odpowiedzi, per endpoint (liczniki we współdzielonym cache)."
+
+    def handle(self, *args, **options):
+        stats = compression_stats()
+        if not stats:
+            self.stdout.write("Brak skompresowanych odpowiedzi.")
+            return
+        rows = sorted(stats.items(), key=lambda item: item[1]['original'] - item[1]['compressed'], reverse=True)
+        width = max(len(endpoint) for endpoint in stats)
+        self.stdout.write(f"{'endpoint':<{width}}  odpowiedzi   przed [KiB]    po [KiB]  zaoszczędzono")
+        for endpoint, row in rows:
+            saved = row['original'] - row['compressed']
+            self.stdout.write(
+                f"{endpoint:<{width}}  {row['responses']:>10}  {row['original'] / 1024:>12.1f}  "
+                f"{row['compressed'] / 1024:>10.1f}  {saved / 1024:>9.1f} KiB ({saved / row['original']:.0%})"
+            )
@@ -0,0 +1,37 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import importer
+
+
+class Command(BaseCommand):
+    help = "Importuje zadania z pliku CSV / NDJSON (format jak w export_tasks) paczkami bulk_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Plik do zaimportowania.")
+        parser.add_argument("--format", choices=sorted(importer.READERS), default=None,
+                            help="Domyślnie według rozszerzenia pliku.")
+        parser.add_argument("--notify", choices=importer.TaskImporter.NOTIFY_CHOICES, default="rows",
+                            help="Powiadomienia: o każdym zadaniu, jedno podsumowanie na osobę albo żadne.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Wierszy na paczkę/transakcję.")
+
+    def handle(self, *args, **options):
+        file_format = options["format"] or os.path.splitext(options["path"])[1].lstrip(".").lower()
+        if file_format not in importer.READERS:
+            raise CommandError("Nieznany format pliku – podaj --format csv albo --format ndjson.")
+
+        task_importer = importer.TaskImporter(notify=options["notify"], batch_size=options["batch_size"])
+        try:
+            with open(options["path"], "rb") as source:
+                task_importer.run(importer.READERS[file_format](importer.text_stream(source)))
+        except (OSError, UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f"Nie można odczytać pliku: {exc} (zapisano {task_importer.created} zadań)")
+
+        for error in task_importer.errors:
+            self.stderr.write(f"Wiersz {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wierszy: {task_importer.rows}, utworzono: {task_importer.created}, "
+            f"błędnych: {task_importer.failed} – {task_importer.rows_per_second:.0f} wierszy/s"
+        ))
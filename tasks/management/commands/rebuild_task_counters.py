@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from tasks.counters import KEY_FIELDS
+from tasks.models import Task, TaskCounter
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera liczniki zadań używane przez dashboard (TaskCounter)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Tylko pokaż rozbieżności.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                tuple(row[field] for field in KEY_FIELDS): row['count']
+                for row in Task.objects.values(*KEY_FIELDS).annotate(count=Count('id')).order_by()
+            }
+            current = {
+                (c.team_id, c.assignee_id, c.status, c.priority, c.completed): c.count
+                for c in TaskCounter.objects.select_for_update()
+            }
+            drift = [
+                key for key in expected.keys() | current.keys()
+                if expected.get(key, 0) != current.get(key, 0)
+            ]
+            self.stdout.write(f"Rozbieżne liczniki: {len(drift)}")
+            if options["dry_run"]:
+                return
+
+            TaskCounter.objects.all().delete()
+            TaskCounter.objects.bulk_create([
+                TaskCounter(
+                    team_id=team_id,
+                    assignee_id=assignee_id,
+                    status=status,
+                    priority=priority,
+                    completed=completed,
+                    count=count,
+                )
+                for (team_id, assignee_id, status, priority, completed), count in expected.items()
+            ])
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono {len(expected)} liczników."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = "Wysyła zaległe e-maile i wydarzenia Google Calendar z outboxa (z ponawianiem)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Opróżnij kolejkę raz i zakończ.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Liczba wiadomości na paczkę.")
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Pauza (s) między przebiegami, gdy kolejka jest pusta.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = process_batch(options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"Wysłano: {sent}, nieudane: {failed}")
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,130 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.http import ConditionalGetMiddleware
+from django.urls import get_resolver
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # bez pakietu brotli – tylko gzip
+    brotli = None
+
+# Kompresja i słabe ETagi dla odpowiedzi budowanych w całości (API, app.html).
+# Odpowiedzi strumieniowe (eksport, SSE) przechodzą bez zmian – kompresja
+# buforowałaby zdarzenia SSE, a eksport ma być wysyłany bez trzymania w pamięci.
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+STATS_FIELDS = ('responses', 'original', 'compressed')
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        params = params.strip()
+        quality = 1.0
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _compress(encoding, content):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    # losowe bajty w nagłówku gzip utrudniają BREACH (jak GZipMiddleware Django)
+    return compress_string(content, max_random_bytes=100)
+
+
+def _stats_key(endpoint, field):
+    return f"tasks:compression:{endpoint}:{field}"
+
+
+def _add(key, delta):
+    if not cache.add(key, delta, timeout=None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # licznik wyrzucony z cache między add a incr
+            pass
+
+
+def compression_stats():
+    """{endpoint: {'responses', 'original', 'compressed'}} dla endpointów, które coś skompresowały."""
+    endpoints = sorted({name for name in get_resolver().reverse_dict if isinstance(name, str)} | {'other'})
+    found = cache.get_many([_stats_key(endpoint, field) for endpoint in endpoints for field in STATS_FIELDS])
+    return {
+        endpoint: {field: found.get(_stats_key(endpoint, field), 0) for field in STATS_FIELDS}
+        for endpoint in endpoints
+        if _stats_key(endpoint, 'responses') in found
+    }
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """br (jeśli jest pakiet brotli) albo gzip dla odpowiedzi od RESPONSE_COMPRESSION_MIN_SIZE bajtów."""
+
+    def process_response(self, request, response):
+        if (
+            not settings.RESPONSE_COMPRESSION
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+            or 'no-transform' in response.get('Cache-Control', '')
+            or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = next((
+            name for name in settings.RESPONSE_COMPRESSION
+            if (name in accepted or '*' in accepted) and (name != 'br' or brotli is not None)
+        ), None)
+        if encoding is None:
+            return response
+
+        original = len(response.content)
+        compressed = _compress(encoding, response.content)
+        if len(compressed) >= original:
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        # treść zależy od kodowania – silny ETag musi stać się słaby (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match and match.url_name else 'other'
+        for field, value in zip(STATS_FIELDS, (1, original, len(compressed))):
+            _add(_stats_key(endpoint, field), value)
+        return response
+
+
+class WeakETagMiddleware(ConditionalGetMiddleware):
+    """Słaby ETag (skrót treści) dla odpowiedzi 200 na GET bez własnego ETagu; 304 przy If-None-Match.
+
+    ETag liczony przed kompresją, więc ten sam dla gzip, br i odpowiedzi bez kompresji.
+    """
+
+    def process_response(self, request, response):
+        if (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.has_header('ETag')
+            and self.needs_etag(response)
+            and response.content
+        ):
+            digest = hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+            response.headers['ETag'] = f'W/"{digest}"'
+        return super().process_response(request, response)
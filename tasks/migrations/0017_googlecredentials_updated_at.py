@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0016_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googlecredentials',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_counters(apps, schema_editor):
+    # jawnie baza migrowana – router kierowałby zapytania do bazy głównej
+    db = schema_editor.connection.alias
+    Task = apps.get_model('tasks', 'Task')
+    TaskCounter = apps.get_model('tasks', 'TaskCounter')
+    rows = (
+        Task.objects.using(db).values('team_id', 'assigned_to_id', 'status', 'priority', 'completed')
+        .annotate(count=models.Count('id'))
+        .order_by()
+    )
+    TaskCounter.objects.using(db).bulk_create([
+        TaskCounter(
+            team_id=row['team_id'],
+            assignee_id=row['assigned_to_id'],
+            status=row['status'],
+            priority=row['priority'],
+            completed=row['completed'],
+            count=row['count'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0018_taskcalendarevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50)),
+                ('priority', models.CharField(max_length=50)),
+                ('completed', models.BooleanField(default=False)),
+                ('count', models.IntegerField(default=0)),
+                ('assignee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_counters', to=settings.AUTH_USER_MODEL)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_counters', to='tasks.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignee', 'status'], name='tasks_taskc_assigne_704c65_idx')],
+                'constraints': [models.UniqueConstraint(fields=('team', 'assignee', 'status', 'priority', 'completed'), name='unique_task_counter_key')],
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import migrations
+
+# Schemat zapisany wprost w migracji – nie zależy od późniejszych zmian tasks/search.py.
+# Słownik PostgreSQL z ustawień, jak przy wyszukiwaniu (domyślnie 'simple').
+
+TABLE = 'tasks_task_search'
+
+
+def _postgresql_schema():
+    config = getattr(settings, 'TASK_SEARCH_CONFIG', 'simple')
+    return [
+        f"""
+        CREATE TABLE {TABLE} (
+            task_id bigint PRIMARY KEY REFERENCES tasks_task (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+            team_id bigint NOT NULL,
+            assignee_id bigint NOT NULL,
+            title text NOT NULL,
+            body text NOT NULL,
+            document tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('{config}', title), 'A') ||
+                setweight(to_tsvector('{config}', body), 'B')
+            ) STORED
+        )
+        """,
+        f"CREATE INDEX {TABLE}_document_gin ON {TABLE} USING gin (document)",
+    ]
+
+
+def _sqlite_schema():
+    return [f"""
+        CREATE VIRTUAL TABLE {TABLE} USING fts5(
+            title, body, team_id UNINDEXED, assignee_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """]
+
+
+SCHEMA = {
+    'postgresql': _postgresql_schema,
+    'sqlite': _sqlite_schema,
+}
+
+INSERT = {
+    'postgresql': f"INSERT INTO {TABLE} (task_id, team_id, assignee_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+    'sqlite': f"INSERT INTO {TABLE} (rowid, team_id, assignee_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in SCHEMA:
+        return
+    db = schema_editor.connection.alias
+    Task = apps.get_model('tasks', 'Task')
+    Comment = apps.get_model('tasks', 'Comment')
+    comments = {}
+    for task_id, content in Comment.objects.using(db).order_by('id').values_list('task_id', 'content'):
+        comments.setdefault(task_id, []).append(content)
+    rows = [
+        (task_id, team_id, assignee_id, title, '\n'.join([description, *comments.get(task_id, [])]))
+        for task_id, team_id, assignee_id, title, description in Task.objects.using(db).values_list(
+            'id', 'team_id', 'assigned_to_id', 'title', 'description'
+        ).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for statement in SCHEMA[vendor]():
+            cursor.execute(statement)
+        if rows:
+            cursor.executemany(INSERT[vendor], rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in SCHEMA:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0019_taskcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from taggit.managers import TaggableManager
 
@@ -55,8 +56,47 @@ class Task(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='tasks')
     tags = TaggableManager(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            # filtry listy: zespół menedżera / zadania pracownika + zakres terminów
+            models.Index(fields=['team', 'status', 'due_date']),
+            models.Index(fields=['assigned_to', 'completed', 'due_date']),
+        ]
+
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # migawka wartości z bazy – sygnały porównują z nią bez dodatkowego SELECT-a
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_loaded_value(self, attname, default=None):
+        """Wartość pola (attname, np. `assigned_to_id`) z chwili wczytania lub ostatniego zapisu."""
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_saved_values(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # także przy doczytaniu pola odroczonego (fields=[to pole])
+        self.remember_saved_values(fields)
+
+    def remember_saved_values(self, update_fields=None):
+        """Odświeża migawkę po zapisie – także zbiorczym (bulk_update) – i po refresh_from_db."""
+        loaded = getattr(self, '_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if update_fields is None or field.name in update_fields or field.attname in update_fields:
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
     
 
 class Comment(models.Model):
@@ -65,6 +105,11 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"Komentarz {self.author.username} do zadania: {self.task.title}"
     
@@ -77,6 +122,11 @@ class TaskLog(models.Model):
     new_value = models.TextField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+        ]
+
     def __str__(self):
         return f"Zmiana {self.change_type} przez {self.user} - ({self.timestamp})"
     
@@ -116,11 +166,32 @@ class GoogleCredentials(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="google_credentials")
     # zapisujemy JSON wygenerowany przez Credentials.to_json()
     credentials_json = models.JSONField()
+    # wersja poświadczeń – klucz cache klientów Calendar w google_integration
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Google creds for {self.user.username}"
 
 
+class TaskCalendarEvent(models.Model):
+    """Wydarzenie zadania w kalendarzu Google danego użytkownika.
+
+    Zadanie synchronizuje przypisany i (zbiorczo) staff – każdy do swojego
+    kalendarza, więc id wydarzenia jest osobne dla pary zadanie–użytkownik.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='calendar_events')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calendar_events')
+    event_id = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'user'], name='unique_task_calendar_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}/{self.user_id}: {self.event_id}"
+
+
 class GoogleOAuthState(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="google_oauth_states")
     state = models.CharField(max_length=255, unique=True)
@@ -134,3 +205,71 @@ class GoogleOAuthState(models.Model):
 
  
     
+
+
+class OutboxMessage(models.Model):
+    """Efekt uboczny (e-mail, Google Calendar) zapisany w transakcji zadania.
+
+    Wiadomości wysyła w tle `manage.py run_outbox`.
+    """
+    KIND_TASK_EMAIL = 'task_email'
+    KIND_CALENDAR_SYNC = 'calendar_sync'
+    KIND_CHOICES = (
+        (KIND_TASK_EMAIL, 'E-mail o zadaniu'),
+        (KIND_CALENDAR_SYNC, 'Synchronizacja z Google Calendar'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Oczekuje'),
+        (STATUS_DONE, 'Wysłane'),
+        (STATUS_FAILED, 'Błąd'),
+    )
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class TaskCounter(models.Model):
+    """Liczba zadań w danym przekroju – aktualizowana przyrostowo przy zapisie/usunięciu Task.
+
+    Dashboard czyta z tej tabeli zamiast liczyć zadania; `manage.py rebuild_task_counters`
+    przelicza ją od zera.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='task_counters')
+    assignee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_counters')
+    status = models.CharField(max_length=50)
+    priority = models.CharField(max_length=50)
+    completed = models.BooleanField(default=False)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['team', 'assignee', 'status', 'priority', 'completed'],
+                name='unique_task_counter_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['assignee', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id}/{self.assignee_id}/{self.status}/{self.priority}: {self.count}"
@@ -0,0 +1,45 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import TaskStatusOption, TaskPriorityOption
+from .versions import get_version, bump_version
+
+
+class OptionRegistry:
+    """Zbiór dozwolonych wartości (status / priorytet) trzymany w pamięci procesu.
+
+    Ważność sprawdzana jest po wersji we współdzielonym cache Django; zapis lub
+    usunięcie opcji ustawia nową wersję, więc każdy worker przeładuje zbiór raz.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_name = model._meta.model_name
+        self._state = (None, (), frozenset())
+
+    def version(self):
+        return get_version(self.version_name)
+
+    def _load(self):
+        version = self.version()
+        if version is None or version != self._state[0]:
+            # z bazy głównej – zbiór z opóźnionej repliki zostałby w pamięci do następnej wersji
+            ordered = tuple(self.model.objects.using(DEFAULT_DB_ALIAS).values_list('value', flat=True))
+            self._state = (version, ordered, frozenset(ordered))
+        return self._state
+
+    def values(self):
+        return self._load()[2]
+
+    def ordered(self):
+        """Wartości w kolejności słownika (Meta.ordering: order, label)."""
+        return self._load()[1]
+
+    def __contains__(self, value):
+        return value in self.values()
+
+    def invalidate(self):
+        bump_version(self.version_name)
+
+
+status_options = OptionRegistry(TaskStatusOption)
+priority_options = OptionRegistry(TaskPriorityOption)
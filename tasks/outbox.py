@@ -0,0 +1,125 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage, Task
+from .utils import send_task_notification
+from .google_integration import get_calendar_service, sync_task_event
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(kind, payload):
+    """Dopisuje wiadomość do outboxa w bieżącej transakcji."""
+    return OutboxMessage.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_task_created(tasks):
+    """E-mail do przypisanego i synchronizacja kalendarza dla nowych zadań – jeden INSERT."""
+    messages = []
+    for task in tasks:
+        if task.assigned_to and task.assigned_to.email:
+            messages.append(OutboxMessage(kind=OutboxMessage.KIND_TASK_EMAIL, payload={
+                "task_id": task.pk,
+                "email": task.assigned_to.email,
+            }))
+        if task.assigned_to and task.due_date:
+            messages.append(OutboxMessage(kind=OutboxMessage.KIND_CALENDAR_SYNC, payload={
+                "task_id": task.pk,
+                "user_id": task.assigned_to_id,
+            }))
+    return OutboxMessage.objects.bulk_create(messages)
+
+
+def _handle_task_email(payload):
+    task = Task.objects.filter(pk=payload["task_id"]).first()
+    if task is None:
+        return
+    send_task_notification(task, payload["email"])
+
+
+def _handle_calendar_sync(payload):
+    task = Task.objects.filter(pk=payload["task_id"]).first()
+    user = User.objects.filter(pk=payload["user_id"]).first()
+    if task is None or user is None or not task.due_date:
+        return
+    service = get_calendar_service(user)
+    if not service:
+        return
+    sync_task_event(service, user, task)
+    logger.info("Utworzono automatyczne wydarzenie Google Calendar dla zadania %s", task.pk)
+
+
+HANDLERS = {
+    OutboxMessage.KIND_TASK_EMAIL: _handle_task_email,
+    OutboxMessage.KIND_CALENDAR_SYNC: _handle_calendar_sync,
+}
+
+
+def backoff_delay(attempts):
+    """Wykładnicze opóźnienie kolejnej próby, ograniczone z góry."""
+    delay = settings.OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(limit=None):
+    """Rezerwuje paczkę wiadomości do wysłania.
+
+    Zarezerwowane wiadomości dostają `available_at` przesunięte o czas dzierżawy,
+    więc równoległy worker ich nie weźmie, a po awarii workera wrócą do kolejki.
+    """
+    limit = limit or settings.OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.STATUS_PENDING, available_at__lte=now)
+            .order_by('available_at', 'id')[:limit]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in batch]).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        )
+    return batch
+
+
+def deliver(message):
+    """Wysyła jedną wiadomość; zwraca True, jeśli się udało."""
+    handler = HANDLERS.get(message.kind)
+    message.attempts += 1
+    try:
+        if handler is None:
+            raise ValueError(f"Nieznany typ wiadomości outboxa: {message.kind}")
+        handler(message.payload)
+    except Exception as exc:
+        message.last_error = str(exc)
+        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxMessage.STATUS_FAILED
+            message.processed_at = timezone.now()
+            logger.warning("Outbox %s porzucony po %s próbach: %s", message.pk, message.attempts, exc)
+        else:
+            message.available_at = timezone.now() + backoff_delay(message.attempts)
+            logger.warning("Outbox %s – próba %s nieudana: %s", message.pk, message.attempts, exc)
+        message.save(update_fields=['attempts', 'last_error', 'status', 'available_at', 'processed_at'])
+        return False
+
+    message.status = OutboxMessage.STATUS_DONE
+    message.processed_at = timezone.now()
+    message.last_error = ""
+    message.save(update_fields=['attempts', 'last_error', 'status', 'processed_at'])
+    return True
+
+
+def process_batch(limit=None):
+    """Wysyła jedną paczkę; zwraca (wysłane, nieudane)."""
+    sent = failed = 0
+    for message in claim_batch(limit):
+        if deliver(message):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Paginacja kursorowa (keyset) – koszt każdej strony jest taki sam jak pierwszej.
+
+    Kolejność musi być stabilna i unikalna, dlatego zawsze kończy się na ``id``.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class CommentPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
+class TaskLogPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
@@ -1,19 +1,21 @@
 from rest_framework import permissions
 
+from .authz import get_auth_context
+
+
 class IsTeamManagerOrAssigned(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        user = request.user
+        # same identyfikatory – bez wczytywania profilu, zespołu ani przypisanego
+        context = get_auth_context(request)
 
-        if user.is_superuser:
+        if context.is_superuser:
             return True
 
-        if not hasattr(user, 'profile'):
+        if not context.has_profile:
             return False
 
-        profile = user.profile
-
-        if profile.role == 'manager' and obj.team == profile.team:
+        if context.is_manager and obj.team_id == context.team_id:
             return True
         
-        return obj.assigned_to == user
\ No newline at end of file
+        return obj.assigned_to_id == context.user_id
@@ -0,0 +1,49 @@
+import codecs
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # bez orjson – zwykły moduł json (klasy bazowe DRF)
+    orjson = None
+
+# JSON przez orjson z tym samym wynikiem co JSONRenderer/JSONParser DRF:
+# daty z "Z" dla UTC, Decimal jako liczba, typy spoza JSON-a przez
+# JSONEncoder.default z DRF. Różnice tylko w przypadkach brzegowych: wykładnik
+# liczby (1e16 zamiast 1e+16) i NaN/Infinity jako null zamiast błędu.
+
+_ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # wcięcia (np. BrowsableAPIRenderer, `; indent=4`) – zwykły json
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        try:
+            content = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # np. liczba całkowita spoza 64 bitów
+            return super().render(data, accepted_media_type, renderer_context)
+        # jak w JSONRenderer: \u2028/\u2029 escapowane (JSON jako podzbiór JavaScriptu)
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        # orjson czyta tylko UTF-8
+        if orjson is None or codecs.lookup(get_encoding(parser_context or {})).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
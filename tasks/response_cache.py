@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .versions import version_digest
+
+# Cache odpowiedzi list i szczegółów zadań (views.CachedResponseMixin).
+#
+# Klucz to skrót generacji tabel, od których zależy odpowiedź (versions.py,
+# podbijane sygnałami przy każdym zapisie), zakresu widoczności użytkownika
+# i ścieżki z query stringiem. Zapis w którejkolwiek z tych tabel zmienia
+# klucz – starych wpisów się nie usuwa, same wygasają. Wpisy i liczniki
+# trafień leżą w osobnym aliasie cache ('responses').
+
+TASK_GENERATIONS = ('task', 'comment', 'tag', 'team', 'category', 'profile')
+
+OUTCOMES = ('hit', 'miss')
+
+
+def _cache():
+    return caches['responses']
+
+
+def _stats_key(name, outcome):
+    return f"tasks:response:stats:{name}:{outcome}"
+
+
+def make_key(generations, *parts):
+    return f"tasks:response:{version_digest(generations, *parts)}"
+
+
+def _count(name, outcome):
+    key = _stats_key(name, outcome)
+    if not _cache().add(key, 1, timeout=None):
+        try:
+            _cache().incr(key)
+        except ValueError:
+            # licznik wyrzucony z cache między add a incr
+            pass
+
+
+def lookup(key, name):
+    """Zapamiętane dane odpowiedzi albo None; liczy trafienia i chybienia."""
+    data = _cache().get(key)
+    _count(name, 'miss' if data is None else 'hit')
+    return data
+
+
+def store(key, data, timeout=None):
+    _cache().set(key, data, timeout=timeout or settings.TASK_RESPONSE_CACHE_TIMEOUT)
+
+
+def stats(names):
+    """{nazwa: {'hit': n, 'miss': n}} – liczniki wspólne dla wszystkich workerów."""
+    keys = {(name, outcome): _stats_key(name, outcome) for name in names for outcome in OUTCOMES}
+    found = _cache().get_many(keys.values())
+    result = {name: {} for name in names}
+    for (name, outcome), key in keys.items():
+        result[name][outcome] = found.get(key, 0)
+    return result
@@ -0,0 +1,70 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Odczyty z replik (settings.DATABASE_REPLICAS) tylko tam, gdzie widok włączy je
+# jawnie (views.ReplicaReadMixin – bezpieczne żądania); zapisy i wszystkie inne
+# odczyty idą do bazy głównej. Po zapisie użytkownik przez REPLICA_PIN_SECONDS
+# czyta z bazy głównej, żeby widział własne zmiany mimo opóźnienia replikacji.
+# Przypięcie jest w cache, więc przy replikach cache musi być współdzielony
+# między workerami (checks.replica_cache_check).
+
+_read_alias = ContextVar('tasks_read_alias', default=None)
+
+
+def _pin_key(user_id):
+    return f"tasks:db:pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    if user_id is not None and settings.DATABASE_REPLICAS:
+        cache.set(_pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(_pin_key(user_id)) is not None
+
+
+def choose_replica(user_id):
+    """Replika dla odczytów tego żądania albo None (brak replik lub świeży zapis)."""
+    if not settings.DATABASE_REPLICAS or is_pinned(user_id):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def use_replica(alias):
+    """Odczyty do końca bieżącego read_from() idą do `alias` (None – baza główna)."""
+    _read_alias.set(alias)
+
+
+def reading_from_replica():
+    return _read_alias.get() is not None
+
+
+@contextmanager
+def read_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReadReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # jawnie – bez tego obiekt wczytany z repliki zapisałby się do repliki
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
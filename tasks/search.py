@@ -0,0 +1,204 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Expression, F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Task
+
+# Indeks pełnotekstowy zadań: tytuł (waga wyższa) oraz opis razem z treścią
+# komentarzy. PostgreSQL – tabela z kolumną tsvector i indeksem GIN,
+# SQLite – wirtualna tabela FTS5. Tabele tworzy migracja 0020.
+
+TABLE = 'tasks_task_search'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _terms(query):
+    return _WORD_RE.findall(query or '')[:16]
+
+
+class PostgresSearchBackend:
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(f"""
+            INSERT INTO {TABLE} (task_id, team_id, assignee_id, title, body)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (task_id) DO UPDATE SET
+                team_id = EXCLUDED.team_id,
+                assignee_id = EXCLUDED.assignee_id,
+                title = EXCLUDED.title,
+                body = EXCLUDED.body
+        """, rows)
+
+    def update_scope(self, cursor, task_id, team_id, assignee_id):
+        cursor.execute(
+            f"UPDATE {TABLE} SET team_id = %s, assignee_id = %s WHERE task_id = %s",
+            [team_id, assignee_id, task_id],
+        )
+
+    def delete(self, cursor, task_id):
+        cursor.execute(f"DELETE FROM {TABLE} WHERE task_id = %s", [task_id])
+
+    def match_sql(self, terms):
+        # każde słowo jako prefiks, wszystkie wymagane
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        config = settings.TASK_SEARCH_CONFIG
+        return f"SELECT task_id FROM {TABLE} WHERE document @@ to_tsquery('{config}', %s)", [tsquery]
+
+    def rank_sql(self, terms):
+        _, params = self.match_sql(terms)
+        config = settings.TASK_SEARCH_CONFIG
+        return (
+            f"SELECT ts_rank(document, to_tsquery('{config}', %s))::double precision FROM {TABLE} WHERE task_id = ",
+            params,
+        )
+
+
+class SqliteSearchBackend:
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, team_id, assignee_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+    def update_scope(self, cursor, task_id, team_id, assignee_id):
+        cursor.execute(
+            f"UPDATE {TABLE} SET team_id = %s, assignee_id = %s WHERE rowid = %s",
+            [team_id, assignee_id, task_id],
+        )
+
+    def delete(self, cursor, task_id):
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [task_id])
+
+    def match_sql(self, terms):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [match]
+
+    def rank_sql(self, terms):
+        _, params = self.match_sql(terms)
+        # bm25 jest ujemne (mniejsze = lepsze) – odwracamy, żeby obie bazy sortowały malejąco
+        return f"SELECT -bm25({TABLE}, 10.0, 1.0) FROM {TABLE} WHERE {TABLE} MATCH %s AND {TABLE}.rowid = ", params
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_backend(vendor=None):
+    backend = BACKENDS.get(vendor or connection.vendor)
+    return backend() if backend else None
+
+
+def _document_rows(task_ids):
+    tasks = Task.objects.filter(pk__in=task_ids).values_list(
+        'id', 'team_id', 'assigned_to_id', 'title', 'description'
+    )
+    comments = {}
+    for task_id, content in Comment.objects.filter(task_id__in=task_ids).order_by('id').values_list('task_id', 'content'):
+        comments.setdefault(task_id, []).append(content)
+    return [
+        (task_id, team_id, assignee_id, title, '\n'.join([description, *comments.get(task_id, [])]))
+        for task_id, team_id, assignee_id, title, description in tasks
+    ]
+
+
+def index_tasks(task_ids):
+    """Przelicza wpisy indeksu dla podanych zadań (po zapisie zadania lub komentarza)."""
+    backend = get_backend()
+    if backend is None or not task_ids:
+        return
+    rows = _document_rows(task_ids)
+    if rows:
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, rows)
+
+
+def index_task(task, created=False):
+    """Wpis indeksu dla zapisanego zadania – pola z instancji, z bazy tylko komentarze."""
+    backend = get_backend()
+    if backend is None:
+        return
+    comments = [] if created else list(
+        Comment.objects.filter(task_id=task.pk).order_by('id').values_list('content', flat=True)
+    )
+    row = (task.pk, task.team_id, task.assigned_to_id, task.title, '\n'.join([task.description, *comments]))
+    with connection.cursor() as cursor:
+        backend.upsert(cursor, [row])
+
+
+def update_task_scope(task):
+    """Zmiana zespołu/przypisania nie zmienia treści – aktualizujemy tylko kolumny filtrów."""
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        backend.update_scope(cursor, task.pk, task.team_id, task.assigned_to_id)
+
+
+def remove_task(task_id):
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        backend.delete(cursor, task_id)
+
+
+class SearchRank(Expression):
+    """Trafność dopasowania (większa = lepsza) – podzapytanie skorelowane z id zadania."""
+
+    output_field = FloatField()
+
+    def __init__(self, sql, params, task=F('pk')):
+        super().__init__()
+        self.sql, self.rank_params, self.task = sql, params, task
+
+    def get_source_expressions(self):
+        return [self.task]
+
+    def set_source_expressions(self, exprs):
+        self.task, = exprs
+
+    def as_sql(self, compiler, connection):
+        task_sql, task_params = compiler.compile(self.task)
+        return f"({self.sql}{task_sql})", (*self.rank_params, *task_params)
+
+
+def search_tasks(queryset, query, team_id=None, assignee_id=None):
+    """Zawęża queryset do zadań pasujących do zapytania i dodaje `search_rank`.
+
+    Dopasowanie to podzapytanie w tym samym SQL co pozostałe filtry, więc filtry
+    i paginacja działają na wszystkich trafieniach, a nie na z góry uciętej liście.
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    backend = get_backend()
+    if backend is None:
+        # inne bazy – wolne icontains, bez oceny trafności
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term)
+                | Q(description__icontains=term)
+                | Q(comments__content__icontains=term)
+            )
+        return queryset.filter(pk__in=Task.objects.filter(condition).values('pk')).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    sql, params = backend.match_sql(terms)
+    # zakres widoczności już w indeksie – podzapytanie nie przegląda cudzych trafień
+    if team_id is not None:
+        sql += ' AND team_id = %s'
+        params.append(team_id)
+    if assignee_id is not None:
+        sql += ' AND assignee_id = %s'
+        params.append(assignee_id)
+    return queryset.filter(pk__in=RawSQL(sql, params)).annotate(search_rank=SearchRank(*backend.rank_sql(terms)))
@@ -1,5 +1,9 @@
+import functools
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import Prefetch, prefetch_related_objects
 from .models import (
     Task,
     Team,
@@ -12,6 +16,8 @@ from .models import (
     TaskStatusOption,
 )
 from taggit.serializers import TagListSerializerField, TaggitSerializer
+from .batching import defer_create
+from .options import status_options, priority_options
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -56,7 +62,7 @@ class TaskSerializer(TaggitSerializer, serializers.ModelSerializer):
     )
 
     def validate_status(self, value):
-        if not TaskStatusOption.objects.filter(value=value).exists():
+        if value not in status_options:
             raise serializers.ValidationError("Nieznany status zadania.")
         user = self.context['request'].user
         if value == 'done' and not user.is_staff:
@@ -64,16 +70,16 @@ class TaskSerializer(TaggitSerializer, serializers.ModelSerializer):
         return value
 
     def validate_priority(self, value):
-        if not TaskPriorityOption.objects.filter(value=value).exists():
+        if value not in priority_options:
             raise serializers.ValidationError("Nieznany priorytet zadania.")
         return value
     
-    def create(self, validated_data):
+    def apply_status_rules(self, validated_data):
         if validated_data.get("status") == "done":
             validated_data["completed"] = True
-        return super().create(validated_data)
-    
-    def update(self, instance, validated_data):
+        return validated_data
+
+    def log_changes(self, instance, validated_data):
         user = self.context['request'].user
 
         for field in ['title', 'description', 'status']:
@@ -81,16 +87,19 @@ class TaskSerializer(TaggitSerializer, serializers.ModelSerializer):
                 old_value = getattr(instance, field)
                 new_value = validated_data[field]
                 if old_value != new_value:
-                    TaskLog.objects.create(
+                    defer_create(TaskLog(
                         task=instance,
                         user=user,
                         change_type=field,
                         old_value=old_value,
-                        new_value=new_value,)
+                        new_value=new_value,))
 
-        if validated_data.get("status") == "done":
-            validated_data["completed"] = True
-        return super().update(instance, validated_data)
+    def create(self, validated_data):
+        return super().create(self.apply_status_rules(validated_data))
+    
+    def update(self, instance, validated_data):
+        self.log_changes(instance, validated_data)
+        return super().update(instance, self.apply_status_rules(validated_data))
 
     class Meta:
         model = Task
@@ -98,6 +107,133 @@ class TaskSerializer(TaggitSerializer, serializers.ModelSerializer):
                    'team_id', 'due_date', 'completed', 'status', 'category', 'category_id', 'priority', 'tags']
 
 
+# kolumny listy zadań dla task_list_rows (+ adnotacje querysetu, np. search_rank)
+TASK_LIST_VALUES = (
+    'id', 'title', 'description', 'assigned_to_id', 'team_id', 'due_date', 'completed',
+    'status', 'category_id', 'priority', 'created_at',
+    'assigned_to__username', 'assigned_to__profile__role', 'team__name', 'category__name',
+)
+
+_due_date_field = serializers.DateTimeField()
+
+
+@functools.cache
+def task_list_fields():
+    """Pola odpowiedzi TaskSerializer (bez write_only) – klucze wierszy task_list_rows."""
+    return tuple(name for name, field in TaskSerializer().fields.items() if not field.write_only)
+
+
+def task_list_rows(rows):
+    """To samo co TaskSerializer(many=True).data, ale z wierszy `.values(*TASK_LIST_VALUES)`.
+
+    Klucze i ich kolejność biorą się z TaskSerializer (task_list_fields) – pole
+    dodane do serializera bez odpowiednika tutaj kończy się KeyError, a nie
+    cichą różnicą w JSON. Zagnieżdżone obiekty budowane są raz na id (słowniki
+    na stronę); członkowie zespołów i tagi wczytywane tymi samymi zapytaniami
+    prefetch co w TaskViewSet, więc kolejność (a tym samym JSON) jest identyczna.
+    """
+    users, teams, categories = {}, {}, {}
+    for row in rows:
+        if row['assigned_to_id'] not in users:
+            users[row['assigned_to_id']] = {
+                'id': row['assigned_to_id'],
+                'username': row['assigned_to__username'],
+                'role': row['assigned_to__profile__role'],
+            }
+        if row['team_id'] not in teams:
+            teams[row['team_id']] = {'id': row['team_id'], 'name': row['team__name'], 'members': []}
+        if row['category_id'] is not None and row['category_id'] not in categories:
+            categories[row['category_id']] = {'id': row['category_id'], 'name': row['category__name']}
+
+    team_objects = [Team(pk=pk) for pk in teams]
+    prefetch_related_objects(team_objects, Prefetch('members', queryset=User.objects.only('id')))
+    for team in team_objects:
+        teams[team.pk]['members'] = [member.pk for member in team.members.all()]
+
+    task_objects = [Task(pk=row['id']) for row in rows]
+    prefetch_related_objects(task_objects, 'tags')
+    tags = {task.pk: [tag.name for tag in task.tags.all()] for task in task_objects}
+
+    fields = task_list_fields()
+    result = []
+    for row in rows:
+        values = {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'assigned_to': users[row['assigned_to_id']],
+            'team': teams[row['team_id']],
+            'due_date': _due_date_field.to_representation(row['due_date']),
+            'completed': row['completed'],
+            'status': row['status'],
+            'category': categories.get(row['category_id']),
+            'priority': row['priority'],
+            'tags': tags[row['id']],
+        }
+        result.append({name: values[name] for name in fields})
+    return result
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PK rozwiązywany ze słownika `context['preloaded'][model]` zamiast zapytania na każdą wartość."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        objects = self.context['preloaded'].get(self.queryset.model, {})
+        try:
+            return objects[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkTaskSerializer(TaskSerializer):
+    """TaskSerializer dla /api/tasks/bulk/ – powiązane obiekty wczytane zawczasu dla całej paczki."""
+    assigned_to_id = PreloadedPrimaryKeyRelatedField(
+        queryset=User.objects.all(), write_only=True, source='assigned_to'
+    )
+    team_id = PreloadedPrimaryKeyRelatedField(
+        queryset=Team.objects.all(), write_only=True, source='team'
+    )
+    category_id = PreloadedPrimaryKeyRelatedField(
+        queryset=Category.objects.all(), write_only=True, source='category'
+    )
+
+    # pola `*_id` w danych operacji -> model, którego obiekty trzeba wczytać
+    RELATED_FIELDS = {
+        'assigned_to_id': User,
+        'team_id': Team,
+        'category_id': Category,
+    }
+
+
+class BulkOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({'id': "To pole jest wymagane dla update i delete."})
+        if attrs['op'] != 'delete' and 'data' not in attrs:
+            raise serializers.ValidationError({'data': "To pole jest wymagane dla create i update."})
+        return attrs
+
+
+class BulkRequestSerializer(serializers.Serializer):
+    """Treść /api/tasks/bulk/; pojedyncze operacje sprawdza BulkOperationSerializer (błędy per operacja)."""
+    operations = serializers.ListField()
+
+    def validate_operations(self, value):
+        if len(value) > settings.TASK_BULK_MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                f"Maksymalnie {settings.TASK_BULK_MAX_OPERATIONS} operacji w jednym żądaniu."
+            )
+        return value
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     role = serializers.ChoiceField(choices=Profile.ROLE_CHOICES, write_only=True)
@@ -114,7 +250,8 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=validated_data['password']
         )
 
-        Profile.objects.create(user=user, role=role)
+        # profil tworzy sygnał post_save – tu tylko ustawiamy rolę
+        Profile.objects.update_or_create(user=user, defaults={'role': role})
         
         return user
     
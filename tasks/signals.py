@@ -1,70 +1,204 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile, Task, Comment, Notification
+from taggit.models import Tag, TaggedItem
+from .models import (
+    Profile,
+    Task,
+    Team,
+    Category,
+    Comment,
+    Notification,
+    TaskStatusOption,
+    TaskPriorityOption,
+)
+from . import counters, search
+from .authz import invalidate_auth_context
+from .tokens import mark_claims_stale, revoke_user_tokens
+from .batching import defer_create, bulk_created, bulk_updated
+from .broker import publish_notifications
+from .versions import bump_version_on_commit
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
-def _notify(user: User, message: str, task: Task | None = None):
-    if user is None:
+def _notify(user_id: int | None, message: str, task: Task | None = None):
+    if user_id is None:
         return
-    Notification.objects.create(user=user, message=message, task=task)
-
-@receiver(pre_save, sender=Task)
-def task_before_save(sender, instance: Task, **kwargs):
-    # zachowaj poprzedniego assigned_to / status do porównania po zapisie
-    if instance.pk:
-        try:
-            original = Task.objects.get(pk=instance.pk)
-            instance._was_assigned_to = original.assigned_to
-            instance._old_status = original.status
-        except Task.DoesNotExist:
-            instance._was_assigned_to = None
-            instance._old_status = None
-    else:
-        instance._was_assigned_to = None
-        instance._old_status = None
+    # w atomic_batch – jeden bulk_create wszystkich powiadomień na końcu transakcji
+    defer_create(Notification(user_id=user_id, message=message, task=task))
 
-@receiver(post_save, sender=Task)
-def task_after_save(sender, instance: Task, created, **kwargs):
+def _notify_task_saved(instance: Task, created):
     if created:
-        if instance.assigned_to:
+        if instance.assigned_to_id:
             _notify(
-                instance.assigned_to,
+                instance.assigned_to_id,
                 f"Przypisano do Ciebie nowe zadanie: “{instance.title}”.",
                 task=instance
             )
         return
 
+    # poprzednie wartości z migawki Task.from_db – bez ponownego odczytu z bazy
     # zmiana przypisanego
-    prev = getattr(instance, '_was_assigned_to', None)
-    if prev != instance.assigned_to:
-        if instance.assigned_to:
-            _notify(instance.assigned_to, f"Otrzymałeś zadanie: “{instance.title}”.", task=instance)
+    prev = instance.get_loaded_value('assigned_to_id')
+    if prev != instance.assigned_to_id:
+        if instance.assigned_to_id:
+            _notify(instance.assigned_to_id, f"Otrzymałeś zadanie: “{instance.title}”.", task=instance)
         if prev:
             _notify(prev, f"Zadanie “{instance.title}” nie jest już do Ciebie przypisane.", task=instance)
 
     # zmiana statusu
-    old_status = getattr(instance, '_old_status', None)
-    if old_status and old_status != instance.status and instance.assigned_to:
+    old_status = instance.get_loaded_value('status')
+    if old_status and old_status != instance.status and instance.assigned_to_id:
         _notify(
-            instance.assigned_to,
+            instance.assigned_to_id,
             f"Status zadania “{instance.title}” zmieniono: {old_status} → {instance.status}.",
             task=instance
         )
 
+@receiver(post_save, sender=Task)
+def task_after_save(sender, instance: Task, created, **kwargs):
+    _notify_task_saved(instance, created)
+
+@receiver(post_save, sender=Task)
+def task_update_counters(sender, instance: Task, created, **kwargs):
+    old_key = None if created else counters.loaded_task_key(instance)
+    counters.move_task(old_key, counters.task_key(instance))
+
+@receiver(post_delete, sender=Task)
+def task_deleted_counters(sender, instance: Task, **kwargs):
+    key = counters.loaded_task_key(instance) or counters.task_key(instance)
+    counters.move_task(key, None)
+
+def _changed(instance: Task, fields):
+    return any(instance.get_loaded_value(field, getattr(instance, field)) != getattr(instance, field)
+               for field in fields)
+
+@receiver(post_save, sender=Task)
+def task_update_search_index(sender, instance: Task, created, **kwargs):
+    if created or _changed(instance, ('title', 'description')):
+        search.index_task(instance, created=created)
+    elif _changed(instance, ('team_id', 'assigned_to_id')):
+        search.update_task_scope(instance)
+
+@receiver(post_delete, sender=Task)
+def task_remove_from_search_index(sender, instance: Task, **kwargs):
+    search.remove_task(instance.pk)
+
+@receiver(bulk_created, sender=Task)
+def tasks_bulk_created(sender, objects, notify=True, **kwargs):
+    # to samo co receivery post_save, ale liczniki i indeks jedną paczką;
+    # notify=False – powiadomienia wysyła nadawca (np. podsumowanie importu)
+    if notify:
+        for task in objects:
+            _notify_task_saved(task, True)
+    counters.move_tasks((None, counters.task_key(task)) for task in objects)
+    search.index_tasks([task.pk for task in objects])
+
+@receiver(bulk_updated, sender=Task)
+def tasks_bulk_updated(sender, objects, **kwargs):
+    # wywoływane przed odświeżeniem migawek – porównujemy z wartościami z bazy
+    for task in objects:
+        _notify_task_saved(task, False)
+    counters.move_tasks((counters.loaded_task_key(task), counters.task_key(task)) for task in objects)
+    search.index_tasks([
+        task.pk for task in objects
+        if _changed(task, ('title', 'description', 'team_id', 'assigned_to_id'))
+    ])
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_update_search_index(sender, instance: Comment, **kwargs):
+    search.index_tasks([instance.task_id])
+
 @receiver(post_save, sender=Comment)
 def comment_created(sender, instance: Comment, created, **kwargs):
     if not created:
         return
     task = instance.task
     # główny adresat – osoba przypisana
-    if task.assigned_to and task.assigned_to != instance.author:
+    if task.assigned_to_id and task.assigned_to_id != instance.author_id:
         _notify(
-            task.assigned_to,
+            task.assigned_to_id,
             f"Nowy komentarz do zadania “{task.title}”: {instance.author.username}: {instance.content[:80]}",
             task=task
         )
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=TaskStatusOption)
+@receiver([post_save, post_delete], sender=TaskPriorityOption)
+def reference_data_changed(sender, **kwargs):
+    # nowa wersja tabeli: unieważnia rejestry opcji (options.py), ETagi słowników
+    # i cache odpowiedzi zadań (response_cache.py)
+    bump_version_on_commit(sender._meta.model_name)
+
+@receiver(m2m_changed, sender=Team.members.through)
+def team_members_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version_on_commit('team')
+
+@receiver(post_delete, sender=User)
+def team_member_deleted(sender, **kwargs):
+    # kaskadowe usunięcie członkostwa nie wysyła m2m_changed
+    bump_version_on_commit('team')
+
+# generacje cache odpowiedzi zadań (response_cache.TASK_GENERATIONS)
+
+@receiver([post_save, post_delete], sender=Task)
+@receiver([bulk_created, bulk_updated], sender=Task)
+def task_generation_changed(sender, **kwargs):
+    bump_version_on_commit('task')
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_generation_changed(sender, **kwargs):
+    # komentarze są w indeksie wyszukiwania (?q=)
+    bump_version_on_commit('comment')
+
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=TaggedItem)
+def tag_generation_changed(sender, **kwargs):
+    bump_version_on_commit('tag')
+
+@receiver(m2m_changed, sender=TaggedItem)
+def task_tags_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version_on_commit('tag')
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def profile_generation_changed(sender, update_fields=None, **kwargs):
+    # nazwa i rola przypisanego są w odpowiedzi; samo logowanie (last_login) nie
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_version_on_commit('profile')
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def auth_context_changed(sender, instance, signal, update_fields=None, **kwargs):
+    # samo logowanie (last_login) nie zmienia roli ani zespołu
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    # od razu i jeszcze raz po commicie – równoległe żądanie mogło
+    # w międzyczasie zapisać w cache stan sprzed transakcji
+    invalidate_auth_context(user_id)
+    transaction.on_commit(lambda: invalidate_auth_context(user_id))
+    # rola/zespół w wydanych tokenach przestają obowiązywać; po commicie jeszcze
+    # raz – token wydany w międzyczasie mógł dostać stan sprzed transakcji
+    mark_claims_stale(user_id)
+    transaction.on_commit(lambda: mark_claims_stale(user_id))
+    if sender is User and (signal is post_delete or not instance.is_active):
+        transaction.on_commit(lambda: revoke_user_tokens(user_id))
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance: Notification, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: publish_notifications([instance]))
+
+@receiver(bulk_created, sender=Notification)
+def notifications_bulk_created(sender, objects, **kwargs):
+    # zapis paczki jest w transakcji (batching.atomic_batch) – publikacja dopiero po commicie
+    transaction.on_commit(lambda: publish_notifications(objects))
@@ -1,3 +1,1686 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from smtplib import SMTPException
+from unittest import mock
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import time
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+import httplib2
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from google.auth.exceptions import RefreshError
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMockSequence
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from taggit.models import Tag
+
+from .models import (
+    Task,
+    Team,
+    Category,
+    Profile,
+    OutboxMessage,
+    GoogleCredentials,
+    Notification,
+    TaskLog,
+    TaskStatusOption,
+    TaskCounter,
+    Comment,
+    TaskCalendarEvent,
+)
+from . import google_integration, importer, instrumentation, response_cache
+from .authentication import LazyUser
+from .batching import atomic_batch, defer_create
+from .checks import replica_cache_check, shared_cache_check
+from .broker import get_broker
+from .filters import TaskFilter
+from .middleware import compression_stats
+from .options import status_options, priority_options
+from .renderers import ORJSONParser, ORJSONRenderer
+from .search import search_tasks
+from .serializers import TaskSerializer
+from .tokens import ContextAccessToken, ContextRefreshToken, revoke_user_tokens
+from .versions import bump_version_on_commit
+
+
+def make_user(username, role='employee', team=None, **extra):
+    user = User.objects.create_user(username=username, password='haslo12345', **extra)
+    Profile.objects.update_or_create(user=user, defaults={'role': role, 'team': team})
+    # odśwież instancję, żeby profile było świeżo wczytane
+    return User.objects.select_related('profile').get(pk=user.pk)
+
+
+def make_task(user, team, index=0, **extra):
+    data = {
+        'title': f"Zadanie {index}",
+        'description': f"Opis {index}",
+        'assigned_to': user,
+        'team': team,
+        'due_date': timezone.now() + timedelta(days=index + 1),
+    }
+    data.update(extra)
+    return Task.objects.create(**data)
+
+
+@override_settings(AUTH_SHARED_CACHE=True)
+class TaskListQueryCountTests(TestCase):
+    """Lista i szczegóły zadań muszą mieć stałą liczbę zapytań."""
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół A")
+        self.category = Category.objects.create(name="Backend")
+        self.manager = make_user('manager', role='manager', team=self.team)
+        self.team.members.add(self.manager)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        # pierwsze żądanie zapisuje kontekst autoryzacji w cache
+        self.client.get(reverse('current-user-info'))
+
+    def _create_tasks(self, count):
+        for i in range(count):
+            worker = make_user(f"worker{Task.objects.count()}", team=self.team)
+            self.team.members.add(worker)
+            task = make_task(worker, self.team, i, category=self.category)
+            task.tags.add('api', f"tag{i}")
+
+    def _list_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        self._create_tasks(2)
+        small = self._list_query_count()
+        self._create_tasks(8)
+        large = self._list_query_count()
+        self.assertEqual(small, large)
+
+    def test_list_query_budget(self):
+        self._create_tasks(5)
+        # zadania z relacjami + członkowie zespołów + tagi
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.status_code, 200)
+        row = response.json()['results'][0]
+        self.assertEqual(row['assigned_to']['role'], 'employee')
+        self.assertEqual(row['category']['name'], "Backend")
+        self.assertIn('api', row['tags'])
+        self.assertIn(self.manager.pk, row['team']['members'])
+
+    def test_list_rows_are_byte_identical_to_task_serializer(self):
+        self._create_tasks(4)
+        make_task(self.manager, self.team, 9, category=None)
+        for params, ordering in (({}, ('-created_at', '-id')), ({'ordering': 'title'}, ('title', 'id'))):
+            response = self.client.get(reverse('task-list'), params)
+            tasks = Task.objects.select_related('assigned_to__profile', 'team', 'category').prefetch_related(
+                Prefetch('team__members', queryset=User.objects.only('id')), 'tags',
+            ).order_by(*ordering)
+            expected = TaskSerializer(tasks, many=True).data
+            self.assertEqual([list(row) for row in response.data['results']], [list(row) for row in expected])
+            self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+    def test_retrieve_query_budget(self):
+        self._create_tasks(1)
+        task = Task.objects.get()
+        # inny query string – rozgrzewa kontekst autoryzacji, ale nie cache odpowiedzi
+        self.client.get(reverse('task-detail', args=[task.pk]), {'warmup': 1})
+        # zadanie + członkowie zespołu + tagi; kontekst autoryzacji już w cache
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('task-detail', args=[task.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], task.pk)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół B")
+        self.user = make_user('pracownik', team=self.team)
+        for i in range(7):
+            make_task(self.user, self.team, i)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse('current-user-info'))
+
+    def _walk(self, url):
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append((data['results'], len(ctx.captured_queries)))
+            url = data['next']
+        return pages
+
+    def test_pages_cover_all_rows_newest_first(self):
+        pages = self._walk(reverse('task-list') + '?page_size=3')
+        ids = [row['id'] for rows, _ in pages for row in rows]
+        expected = list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(rows) for rows, _ in pages], [3, 3, 1])
+
+    def test_deep_pages_cost_the_same_as_first(self):
+        pages = self._walk(reverse('task-list') + '?page_size=2')
+        counts = {queries for _, queries in pages}
+        self.assertEqual(len(counts), 1)
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół C")
+        self.category = Category.objects.create(name="Frontend")
+        self.user = make_user('adresat', team=self.team, email='adresat@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_task(self):
+        return self.client.post(reverse('task-list'), {
+            'title': "Nowe zadanie",
+            'assigned_to_id': self.user.pk,
+            'team_id': self.team.pk,
+            'category_id': self.category.pk,
+            'due_date': (timezone.now() + timedelta(days=2)).isoformat(),
+        }, format='json')
+
+    def test_create_writes_outbox_without_sending(self):
+        response = self._create_task()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        kinds = set(OutboxMessage.objects.values_list('kind', flat=True))
+        self.assertEqual(kinds, {OutboxMessage.KIND_TASK_EMAIL, OutboxMessage.KIND_CALENDAR_SYNC})
+
+    def test_smtp_failure_does_not_break_create(self):
+        with mock.patch('tasks.utils.send_mail', side_effect=SMTPException("down")):
+            response = self._create_task()
+            self.assertEqual(response.status_code, 201)
+            with self.assertLogs('tasks.outbox', 'WARNING'):
+                call_command('run_outbox', '--once', stdout=mock.MagicMock())
+
+        message = OutboxMessage.objects.get(kind=OutboxMessage.KIND_TASK_EMAIL)
+        self.assertEqual(message.status, OutboxMessage.STATUS_PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.available_at, timezone.now())
+        self.assertIn("down", message.last_error)
+
+    def test_run_outbox_delivers_pending_messages(self):
+        self._create_task()
+        call_command('run_outbox', '--once', stdout=mock.MagicMock())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['adresat@example.com'])
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.STATUS_DONE).exists())
+
+    def test_gives_up_after_max_attempts(self):
+        message = OutboxMessage.objects.create(kind='unknown', payload={})
+        with self.settings(OUTBOX_MAX_ATTEMPTS=1), self.assertLogs('tasks.outbox', 'WARNING'):
+            call_command('run_outbox', '--once', stdout=mock.MagicMock())
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.STATUS_FAILED)
+
+
+class CalendarServiceCacheTests(TestCase):
+
+    def setUp(self):
+        google_integration.clear_service_cache()
+        self.user = make_user('google')
+        self.future = (timezone.now() + timedelta(hours=1)).replace(tzinfo=None)
+        GoogleCredentials.objects.create(user=self.user, credentials_json={
+            "token": "stary-token",
+            "refresh_token": "refresh",
+            "client_id": "id",
+            "client_secret": "secret",
+            "expiry": self.future.isoformat() + "Z",
+        })
+
+    def tearDown(self):
+        google_integration.clear_service_cache()
+
+    def _user(self):
+        return User.objects.select_related('google_credentials').get(pk=self.user.pk)
+
+    def test_service_is_built_once(self):
+        with mock.patch.object(google_integration, 'build', wraps=google_integration.build) as build:
+            first = google_integration.get_calendar_service(self._user())
+            second = google_integration.get_calendar_service(self._user())
+        self.assertIs(first, second)
+        self.assertEqual(build.call_count, 1)
+
+    def test_refreshed_token_is_written_back_once(self):
+        GoogleCredentials.objects.filter(user=self.user).update(credentials_json={
+            "token": "stary-token",
+            "refresh_token": "refresh",
+            "client_id": "id",
+            "client_secret": "secret",
+            "expiry": "2000-01-01T00:00:00Z",
+        })
+
+        def fake_refresh(creds, request):
+            creds.token = "nowy-token"
+            creds.expiry = self.future
+
+        with mock.patch('google.oauth2.credentials.Credentials.refresh', autospec=True,
+                        side_effect=fake_refresh) as refresh:
+            google_integration.get_calendar_service(self._user())
+            google_integration.get_calendar_service(self._user())
+
+        self.assertEqual(refresh.call_count, 1)
+        stored = GoogleCredentials.objects.get(user=self.user).credentials_json
+        self.assertEqual(stored["token"], "nowy-token")
+        self.assertIn("expiry", stored)
+
+
+    def test_revoked_refresh_token_is_treated_as_unlinked(self):
+        GoogleCredentials.objects.filter(user=self.user).update(credentials_json={
+            "token": "stary-token",
+            "refresh_token": "odwolany",
+            "client_id": "id",
+            "client_secret": "secret",
+            "expiry": "2000-01-01T00:00:00Z",
+        })
+        task = make_task(self.user, Team.objects.create(name="Zespół G"), 0)
+        client = APIClient()
+        client.force_authenticate(self._user())
+
+        with mock.patch('google.oauth2.credentials.Credentials.refresh', autospec=True,
+                        side_effect=RefreshError("invalid_grant")) as refresh:
+            self.assertIsNone(google_integration.get_calendar_service(self._user()))
+            response = client.post(reverse('task-sync-calendar', args=[task.pk]))
+
+        self.assertEqual(response.status_code, 400)
+        # nieudane poświadczenia nie zostają w cache – każda próba odświeża od nowa
+        self.assertEqual(refresh.call_count, 2)
+
+
+class StubBatchHttp:
+    """Lokalny transport httplib2 odpowiadający na żądania batch Google Calendar."""
+
+    def __init__(self, missing_events=()):
+        self.batches = []
+        self.missing_events = set(missing_events)
+        self.counter = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        parts = re.findall(r"Content-ID: <([^>]+)>.*?\n\n(\w+) (\S+)", body, re.S)
+        self.batches.append([(verb, path) for _, verb, path in parts])
+        chunks = []
+        for content_id, verb, path in parts:
+            event_id = path.split("/events")[1].strip("/").split("?")[0]
+            if event_id in self.missing_events:
+                status_line, payload = "404 Not Found", {"error": {"code": 404}}
+            else:
+                if not event_id:
+                    self.counter += 1
+                    event_id = f"evt{self.counter}"
+                status_line, payload = "200 OK", {"id": event_id}
+            chunks.append(
+                "--stub\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status_line}\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        content = "".join(chunks) + "--stub--"
+        response = httplib2.Response({"status": "200", "content-type": "multipart/mixed; boundary=stub"})
+        return response, content.encode()
+
+
+class CalendarBulkSyncTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół D")
+        self.user = make_user('kalendarz', team=self.team)
+        self.tasks = [make_task(self.user, self.team, i) for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.http = StubBatchHttp()
+
+    def _sync(self, data=None, query="", http=None):
+        service = build("calendar", "v3", http=http or self.http, static_discovery=True)
+        with mock.patch('tasks.views.get_calendar_service', return_value=service), \
+                self.settings(GOOGLE_CALENDAR_BATCH_SIZE=2):
+            return self.client.post(reverse('task-sync-calendar-bulk') + query, data or {}, format='json')
+
+    def _event_ids(self, user):
+        return dict(TaskCalendarEvent.objects.filter(user=user).values_list('task_id', 'event_id'))
+
+    def test_bulk_sync_sends_chunked_batches_and_stores_event_ids(self):
+        response = self._sync()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['synced'], 5)
+        self.assertEqual([len(batch) for batch in self.http.batches], [2, 2, 1])
+        self.assertEqual(set(self._event_ids(self.user).values()), {f"evt{i}" for i in range(1, 6)})
+
+    def test_resync_patches_instead_of_duplicating(self):
+        self._sync()
+        self.http.batches.clear()
+        response = self._sync({'ids': [self.tasks[0].pk, self.tasks[1].pk]})
+        self.assertEqual(response.status_code, 200)
+        verbs = [verb for batch in self.http.batches for verb, _ in batch]
+        self.assertEqual(verbs, ['PATCH', 'PATCH'])
+        self.assertEqual({item['status'] for item in response.json()['results']}, {'updated'})
+        self.assertEqual(TaskCalendarEvent.objects.count(), 5)
+
+    def test_deleted_event_is_cleared_for_next_sync(self):
+        TaskCalendarEvent.objects.create(task=self.tasks[0], user=self.user, event_id='gone')
+        self.http.missing_events.add('gone')
+        response = self._sync({'ids': [self.tasks[0].pk]})
+        self.assertEqual(response.json()['failed'], 1)
+        self.assertFalse(TaskCalendarEvent.objects.exists())
+
+    def test_each_calendar_keeps_its_own_event_ids(self):
+        self._sync()
+        staff = make_user('kalendarz-staff', role='manager', team=self.team, is_staff=True)
+        staff_http = StubBatchHttp()
+        staff_http.counter = 100
+        self.client.force_authenticate(staff)
+        self._sync({'ids': [task.pk for task in self.tasks]}, http=staff_http)
+        # staff dostaje nowe wydarzenia we własnym kalendarzu, nie łata wydarzeń przypisanego
+        self.assertEqual({verb for batch in staff_http.batches for verb, _ in batch}, {'POST'})
+        self.assertEqual(set(self._event_ids(staff).values()), {f"evt{i}" for i in range(101, 106)})
+
+        self.http.batches.clear()
+        self.client.force_authenticate(self.user)
+        self._sync()
+        self.assertEqual({verb for batch in self.http.batches for verb, _ in batch}, {'PATCH'})
+        self.assertEqual(set(self._event_ids(self.user).values()), {f"evt{i}" for i in range(1, 6)})
+
+    def test_single_sync_reports_update(self):
+        sequence = HttpMockSequence([
+            ({'status': '200'}, json.dumps({'id': 'evt1'})),
+            ({'status': '200'}, json.dumps({'id': 'evt1'})),
+        ])
+        service = build("calendar", "v3", http=sequence, static_discovery=True)
+        url = reverse('task-sync-calendar', args=[self.tasks[0].pk])
+        with mock.patch('tasks.views.get_calendar_service', return_value=service):
+            first = self.client.post(url)
+            second = self.client.post(url)
+        self.assertEqual(first.json()['detail'], "Utworzono wydarzenie w Google Calendar.")
+        self.assertEqual(second.json()['detail'], "Zaktualizowano wydarzenie w Google Calendar.")
+        self.assertEqual(self._event_ids(self.user), {self.tasks[0].pk: 'evt1'})
+
+    def test_filters_and_ids_limit_selection(self):
+        Task.objects.filter(pk=self.tasks[0].pk).update(status='in_progress')
+        response = self._sync(query='?status=in_progress')
+        self.assertEqual([item['task_id'] for item in response.json()['results']], [self.tasks[0].pk])
+        response = self._sync({'ids': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self._sync({'ids': [True]})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskChangeTrackingTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół E")
+        self.alice = make_user('alice', team=self.team)
+        self.bob = make_user('bob', team=self.team)
+        self.task = make_task(self.alice, self.team)
+        Notification.objects.all().delete()
+
+    def test_change_detection_costs_no_queries(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.assigned_to_id = self.bob.pk
+        task.status = 'in_progress'
+        with CaptureQueriesContext(connection) as ctx, atomic_batch():
+            task.save()
+        # bez odczytu poprzedniej wersji zadania i użytkowników
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(selects, [])
+        # jeden zbiorczy INSERT powiadomień
+        inserts = [q['sql'] for q in ctx.captured_queries if 'INSERT INTO "tasks_notification"' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        recipients = sorted(Notification.objects.values_list('user__username', flat=True))
+        self.assertEqual(recipients, ['alice', 'bob', 'bob'])
+
+    def test_snapshot_is_refreshed_after_save(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.status = 'in_progress'
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+            task.save()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_snapshot_is_refreshed_after_refresh_from_db(self):
+        task = Task.objects.get(pk=self.task.pk)
+        Task.objects.filter(pk=task.pk).update(status='in_progress')
+        task.refresh_from_db()
+        self.assertEqual(task.get_loaded_value('status'), 'in_progress')
+        # zapis bez zmian po odświeżeniu – nic do powiadomienia
+        task.save()
+        task.status = 'todo'
+        task.refresh_from_db(fields=['status'])
+        task.save()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_unchanged_save_does_not_notify(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.title = "Nowy tytuł"
+        task.save()
+        self.assertFalse(Notification.objects.exists())
+
+
+class BatchedWritesTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół F")
+        self.manager = make_user('szef', role='manager', team=self.team)
+        self.alice = make_user('ala', team=self.team)
+        self.bob = make_user('bartek', team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task = make_task(self.alice, self.team)
+        Notification.objects.all().delete()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _patch(self, data):
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('task-detail', args=[self.task.pk]), data, format='json')
+        self.assertEqual(response.status_code, 200)
+        tables = ('"tasks_tasklog"', '"tasks_notification"')
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('INSERT') and q['sql'].split()[2] in tables
+        ]
+
+    def test_update_writes_logs_and_notifications_in_fixed_number_of_inserts(self):
+        inserts = self._patch({
+            'title': "Inny tytuł",
+            'description': "Inny opis",
+            'status': 'in_progress',
+            'assigned_to_id': self.bob.pk,
+        })
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(TaskLog.objects.filter(task=self.task).count(), 3)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_single_field_change_uses_same_statements(self):
+        inserts = self._patch({'title': "Tylko tytuł"})
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(TaskLog.objects.get(task=self.task).new_value, "Tylko tytuł")
+
+    def test_rolled_back_transaction_discards_pending_rows(self):
+        try:
+            with atomic_batch():
+                defer_create(Notification(user=self.alice, message="wycofane"))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with atomic_batch():
+            defer_create(Notification(user=self.alice, message="zapisane"))
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ["zapisane"])
+
+    def test_rolled_back_savepoint_discards_only_its_rows(self):
+        with atomic_batch():
+            defer_create(Notification(user=self.alice, message="a"))
+            try:
+                with transaction.atomic():
+                    defer_create(Notification(user=self.alice, message="wycofane"))
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with transaction.atomic():
+                defer_create(Notification(user=self.alice, message="b"))
+            defer_create(Notification(user=self.alice, message="c"))
+            # zapis na końcu bloku, przed commitem
+            self.assertFalse(Notification.objects.exists())
+        messages = sorted(Notification.objects.values_list('message', flat=True))
+        self.assertEqual(messages, ["a", "b", "c"])
+
+    def test_failed_flush_rolls_back_the_update(self):
+        with mock.patch('tasks.batching.bulk_created.send', side_effect=IntegrityError("log")):
+            with self.assertRaises(IntegrityError):
+                self._patch({'title': "Nie zapisany"})
+        self.task.refresh_from_db()
+        self.assertNotEqual(self.task.title, "Nie zapisany")
+        self.assertFalse(TaskLog.objects.exists())
+
+    def test_rolled_back_savepoint_discards_version_bump(self):
+        with mock.patch('tasks.versions.bump_version') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    bump_version_on_commit('task')
+                    try:
+                        with transaction.atomic():
+                            bump_version_on_commit('comment')
+                            raise RuntimeError
+                    except RuntimeError:
+                        pass
+        # 'comment' podbity tylko od razu, po commicie jedynie 'task'
+        self.assertEqual([call.args[0] for call in bump.call_args_list], ['task', 'comment', 'task'])
+
+
+class OptionRegistryTests(TestCase):
+
+    def setUp(self):
+        status_options.invalidate()
+        priority_options.invalidate()
+        self.addCleanup(status_options.invalidate)
+        self.user = make_user('walidacja', is_staff=True)
+        self.serializer = TaskSerializer(context={'request': mock.Mock(user=self.user)})
+
+    def test_validation_costs_no_queries_once_loaded(self):
+        self.serializer.validate_status('todo')
+        self.serializer.validate_priority('low')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.serializer.validate_status('in_progress'), 'in_progress')
+            self.assertEqual(self.serializer.validate_priority('high'), 'high')
+
+    def test_saved_option_invalidates_registry(self):
+        self.assertNotIn('blocked', status_options)
+        with self.captureOnCommitCallbacks(execute=True):
+            option = TaskStatusOption.objects.create(value='blocked', label="Zablokowane")
+        self.assertEqual(self.serializer.validate_status('blocked'), 'blocked')
+        with self.captureOnCommitCallbacks(execute=True):
+            option.delete()
+        self.assertNotIn('blocked', status_options)
+
+    def test_unknown_value_is_rejected(self):
+        with self.assertRaises(serializers.ValidationError):
+            self.serializer.validate_priority('pilne')
+
+
+class DashboardCounterTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół G")
+        self.manager = make_user('kierownik', role='manager', team=self.team)
+        self.worker = make_user('wykonawca', team=self.team)
+        self.tasks = [make_task(self.worker, self.team, i) for i in range(4)]
+        self.tasks[0].status = 'in_progress'
+        self.tasks[0].save()
+        self.tasks[1].priority = 'high'
+        self.tasks[1].save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.client.get(reverse('current-user-info'))
+
+    def _dashboard(self, query=''):
+        response = self.client.get(reverse('task-dashboard') + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_follow_saves_and_deletes(self):
+        self.assertEqual(self._dashboard(), [
+            {'status': 'in_progress', 'count': 1},
+            {'status': 'todo', 'count': 3},
+        ])
+        self.tasks[0].delete()
+        self.assertEqual(self._dashboard(), [{'status': 'todo', 'count': 3}])
+
+    def test_dashboard_query_count_is_independent_of_volume(self):
+        with CaptureQueriesContext(connection) as small:
+            self._dashboard()
+        for i in range(20):
+            make_task(self.worker, self.team, i)
+        with CaptureQueriesContext(connection) as large:
+            self._dashboard()
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertNotIn('"tasks_task"', large.captured_queries[-1]['sql'])
+
+    def test_priority_and_overdue_breakdowns(self):
+        self.assertEqual(self._dashboard('?group_by=priority'), [
+            {'priority': 'high', 'count': 1},
+            {'priority': 'medium', 'count': 3},
+        ])
+        Task.objects.filter(pk=self.tasks[2].pk).update(due_date=timezone.now() - timedelta(days=1))
+        self.assertEqual(self._dashboard('?overdue=true'), [{'status': 'todo', 'count': 1}])
+        response = self.client.get(reverse('task-dashboard') + '?group_by=title')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_reconciles_drift(self):
+        TaskCounter.objects.update(count=0)
+        call_command('rebuild_task_counters', stdout=mock.MagicMock())
+        self.assertEqual(sum(TaskCounter.objects.values_list('count', flat=True)), 4)
+        self.assertEqual(self._dashboard()[1], {'status': 'todo', 'count': 3})
+
+
+class NotificationStreamTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół H")
+        self.user = make_user('sluchacz', team=self.team)
+        Notification.objects.create(user=self.user, message="stare")
+        token = AccessToken.for_user(self.user)
+        # wydany chwilę wcześniej – unieważnienie w tej samej sekundzie go obejmuje
+        token['iat'] = int(time.time()) - 10
+        self.token = str(token)
+        self.url = reverse('notification-stream')
+        # unieważnienia z innych testów (ten sam pk użytkownika)
+        cache.clear()
+
+    def _ticket(self):
+        response = self.client.post(reverse('notification-stream-ticket'), HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['ticket']
+
+    async def test_stream_pushes_unread_count_and_events(self):
+        ticket = await sync_to_async(self._ticket)()
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        first = await anext(stream)
+        self.assertIn(b'event: unread_count', first)
+        self.assertIn(b'"unread": 1', first)
+
+        get_broker().publish(self.user.pk, 'unread_delta', {'delta': 2})
+        second = await anext(stream)
+        self.assertIn(b'"delta": 2', second)
+        await stream.aclose()
+
+    async def test_ticket_is_single_use_and_raw_token_is_not_accepted_in_url(self):
+        ticket = await sync_to_async(self._ticket)()
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        await aiter(response.streaming_content).aclose()
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_requires_valid_token(self):
+        response = await self.async_client.get(self.url, {'ticket': 'zly'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, headers={'Authorization': 'Bearer zly'})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(NOTIFICATION_STREAM_RECHECK_SECONDS=0)
+    async def test_revoked_token_closes_stream(self):
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Bearer {self.token}'})
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        await sync_to_async(revoke_user_tokens)(self.user.pk)
+        self.assertIn(b'event: token_expired', await anext(stream))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    def test_stream_needs_asgi(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 501)
+
+    def test_committed_notifications_are_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = make_task(self.user, self.team)
+        with mock.patch.object(get_broker(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                task.status = 'in_progress'
+                task.save()
+        events = [call.args[1] for call in publish.call_args_list]
+        self.assertEqual(events, ['notification', 'unread_delta'])
+        self.assertEqual(publish.call_args_list[1].args[2], {'delta': 1})
+
+    def test_mark_all_as_read_publishes_negative_delta(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(get_broker(), 'publish') as publish:
+            client.post(reverse('notification-mark-all-as-read'))
+        publish.assert_called_once_with(self.user.pk, 'unread_delta', {'delta': -1})
+
+
+class BootstrapETagTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół I")
+        self.user = make_user('startowy', team=self.team)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bootstrap_returns_all_reference_data(self):
+        response = self.client.get(reverse('bootstrap'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'teams', 'categories', 'statuses', 'priorities'})
+        self.assertEqual(data['teams'][0]['name'], "Zespół I")
+        self.assertIn('todo', [status['value'] for status in data['statuses']])
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    def test_matching_etag_answers_304_without_queries(self):
+        etag = self.client.get(reverse('bootstrap'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('bootstrap'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(reverse('bootstrap'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Nowa")
+        response = self.client.get(reverse('bootstrap'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.members.add(self.user)
+        response = self.client.get(reverse('bootstrap'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_lookup_viewsets_support_conditional_get(self):
+        for name in ('team-list', 'category-list', 'status-list', 'priority-list'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+
+class TaskSearchTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół J")
+        self.other_team = Team.objects.create(name="Zespół K")
+        self.manager = make_user('szukajacy', role='manager', team=self.team)
+        self.worker = make_user('robotnik', team=self.team)
+        self.in_title = make_task(self.worker, self.team, 1, title="Migracja bazy danych")
+        self.in_description = make_task(self.worker, self.team, 2, title="Porządki",
+                                        description="Przy okazji migracja konfiguracji")
+        self.other = make_task(self.worker, self.other_team, 3, title="Migracja w innym zespole")
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _search(self, query, **params):
+        response = self.client.get(reverse('task-list'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_results_are_ranked_and_scoped(self):
+        self.assertEqual(self._search("migracja"), [self.in_title.pk, self.in_description.pk])
+
+    def test_prefix_diacritics_and_comments(self):
+        Comment.objects.create(task=self.in_description, author=self.worker, content="Zażółć gęślą jaźń")
+        self.assertEqual(self._search("gesla"), [self.in_description.pk])
+        self.assertEqual(self._search("migr"), [self.in_title.pk, self.in_description.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.in_title.title = "Refaktoryzacja"
+        self.in_title.save()
+        self.assertEqual(self._search("migracja"), [self.in_description.pk])
+        self.assertEqual(self._search("refaktoryzacja"), [self.in_title.pk])
+        self.other.team = self.team
+        self.other.save()
+        self.assertEqual(self._search("zespole"), [self.other.pk])
+        self.other.delete()
+        self.assertEqual(self._search("zespole"), [])
+
+    def test_search_results_paginate_by_rank(self):
+        first = self.client.get(reverse('task-list'), {'q': "migracja", 'page_size': 1}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']],
+                         [self.in_title.pk, self.in_description.pk])
+
+    def test_query_syntax_is_sanitized(self):
+        self.assertEqual(self._search('"migracja) (*'), [self.in_title.pk, self.in_description.pk])
+        self.assertEqual(self._search('***'), [])
+
+    def test_filters_and_pages_cover_every_match(self):
+        # dopasowanie i filtry w jednym zapytaniu – bez z góry uciętej listy trafień
+        extra = [make_task(self.worker, self.team, 10 + index, title=f"Migracja {index}") for index in range(5)]
+        Task.objects.filter(pk=self.in_description.pk).update(status='done')
+        self.assertEqual(self._search("migracja", status='done'), [self.in_description.pk])
+        found, url, params = [], reverse('task-list'), {'q': "migracja", 'page_size': 2}
+        while url:
+            page = self.client.get(url, params).json()
+            found += [row['id'] for row in page['results']]
+            url, params = page['next'], None
+        self.assertEqual(sorted(found), sorted([self.in_title.pk, self.in_description.pk, *(task.pk for task in extra)]))
+
+
+class TaskFilterTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół L")
+        self.manager = make_user('filtrujacy', role='manager', team=self.team)
+        self.worker = make_user('filtrowany', team=self.team)
+        self.other_worker = make_user('inny', team=self.team)
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.overdue = make_task(self.worker, self.team, 1, due_date=now - timedelta(days=2))
+            self.this_week = make_task(self.worker, self.team, 2, status='in_progress',
+                                       priority='high', due_date=now + timedelta(days=3))
+            self.later = make_task(self.other_worker, self.team, 3, status='done', completed=True,
+                                   due_date=now + timedelta(days=30))
+        self.this_week.tags.add('api')
+        self.later.tags.add('api', 'ui')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _ids(self, **params):
+        response = self.client.get(reverse('task-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_range_and_multi_value_filters(self):
+        now = timezone.now()
+        self.assertEqual(
+            self._ids(due_date__gte=now.isoformat(), due_date__lte=(now + timedelta(days=7)).isoformat()),
+            [self.this_week.pk],
+        )
+        self.assertEqual(self._ids(completed='false', due_date__lte=now.isoformat()), [self.overdue.pk])
+        self.assertEqual(self._ids(status__in='todo,in_progress', ordering='due_date'),
+                         [self.overdue.pk, self.this_week.pk])
+        self.assertEqual(self._ids(priority__in='high,low'), [self.this_week.pk])
+        self.assertEqual(self._ids(tags__name__in='api,ui', ordering='due_date'),
+                         [self.this_week.pk, self.later.pk])
+        self.assertEqual(self._ids(assignee=self.other_worker.pk), [self.later.pk])
+
+    def test_ordering_paginates_with_cursor(self):
+        first = self.client.get(reverse('task-list'), {'ordering': '-due_date', 'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']],
+                         [self.later.pk, self.this_week.pk, self.overdue.pk])
+        # nieznane pole sortowania jest ignorowane
+        self.assertEqual(len(self._ids(ordering='description')), 3)
+
+    def test_priority_orders_by_option_order_across_pages(self):
+        self.assertEqual(self._ids(ordering='-priority'), [self.this_week.pk, self.later.pk, self.overdue.pk])
+        found, url, params = [], reverse('task-list'), {'ordering': 'priority', 'page_size': 1}
+        while url:
+            page = self.client.get(url, params).json()
+            found += [row['id'] for row in page['results']]
+            url, params = page['next'], None
+        self.assertEqual(found, [self.overdue.pk, self.later.pk, self.this_week.pk])
+        # pozycje z rejestru opcji (options.py) – bez zapytań o słownik
+        with CaptureQueriesContext(connection) as ctx:
+            self._ids(ordering='priority,-due_date')
+        self.assertEqual([q['sql'] for q in ctx.captured_queries if 'tasks_taskpriorityoption' in q['sql']], [])
+
+    def test_common_filters_use_composite_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("plan zapytania sprawdzany dla SQLite")
+        team_index, assignee_index = [
+            index.name for index in Task._meta.indexes
+            if index.fields in (['team', 'status', 'due_date'], ['assigned_to', 'completed', 'due_date'])
+        ]
+        now = timezone.now()
+        # zakres widoczności jak w TaskViewSet.get_visible_tasks + filtry z query stringa
+        plan = TaskFilter({
+            'status__in': 'todo,in_progress',
+            'due_date__lte': (now + timedelta(days=7)).isoformat(),
+        }, queryset=Task.objects.filter(team_id=self.team.pk)).qs.explain()
+        self.assertIn(team_index, plan)
+        plan = TaskFilter({
+            'completed': 'false',
+            'due_date__lte': now.isoformat(),
+        }, queryset=Task.objects.filter(assigned_to=self.worker)).qs.explain()
+        self.assertIn(assignee_index, plan)
+
+
+class BulkOperationsTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół M")
+        self.other_team = Team.objects.create(name="Zespół N")
+        self.category = Category.objects.create(name="Ops")
+        self.manager = make_user('hurtownik', role='manager', team=self.team)
+        self.alice = make_user('alicja', team=self.team, email='alicja@example.com')
+        self.bob = make_user('bogdan', team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tasks = [make_task(self.alice, self.team, i) for i in range(3)]
+            self.foreign = make_task(self.bob, self.other_team, 9)
+        Notification.objects.all().delete()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _bulk(self, operations):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('task-bulk'), {'operations': operations}, format='json')
+        return response
+
+    def test_mixed_operations_report_per_item_results(self):
+        response = self._bulk([
+            {'op': 'create', 'data': {
+                'title': "Wdrożenie", 'description': "", 'assigned_to_id': self.alice.pk,
+                'team_id': self.team.pk, 'category_id': self.category.pk,
+                'due_date': (timezone.now() + timedelta(days=1)).isoformat(), 'tags': ['ops'],
+            }},
+            {'op': 'update', 'id': self.tasks[0].pk, 'data': {'assigned_to_id': self.bob.pk, 'status': 'in_progress'}},
+            {'op': 'delete', 'id': self.tasks[1].pk},
+            {'op': 'update', 'id': self.foreign.pk, 'data': {'priority': 'high'}},
+            {'op': 'update', 'id': self.tasks[2].pk, 'data': {'priority': 'pilne'}},
+            {'op': 'update', 'id': self.tasks[0].pk, 'data': {'priority': 'high'}},
+            {'op': 'archive'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['deleted'], body['failed']), (1, 1, 1, 4))
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['ok', 'ok', 'ok', 'error', 'error', 'error', 'error'])
+        self.assertIn('priority', body['results'][4]['errors'])
+
+        created = Task.objects.get(pk=body['results'][0]['id'])
+        self.assertEqual(list(created.tags.names()), ['ops'])
+        self.tasks[0].refresh_from_db()
+        self.assertEqual((self.tasks[0].assigned_to, self.tasks[0].status), (self.bob, 'in_progress'))
+        self.assertFalse(Task.objects.filter(pk=self.tasks[1].pk).exists())
+        self.assertEqual(Task.objects.get(pk=self.foreign.pk).priority, 'medium')
+
+        # efekty uboczne jak przy pojedynczych żądaniach
+        self.assertEqual(TaskLog.objects.get(task=self.tasks[0]).new_value, 'in_progress')
+        self.assertEqual(Notification.objects.filter(user=self.alice).count(), 2)
+        self.assertEqual(Notification.objects.filter(user=self.bob).count(), 2)
+        self.assertEqual(OutboxMessage.objects.filter(payload__task_id=created.pk).count(), 2)
+        dashboard = self.client.get(reverse('task-dashboard')).json()
+        self.assertEqual(dashboard, [{'status': 'in_progress', 'count': 1}, {'status': 'todo', 'count': 2}])
+        search = self.client.get(reverse('task-list'), {'q': "wdrożenie"}).json()
+        self.assertEqual([row['id'] for row in search['results']], [created.pk])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def run(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks = [make_task(self.alice, self.team, i) for i in range(count)]
+            operations = [
+                {'op': 'update', 'id': task.pk, 'data': {'status': 'in_progress', 'assigned_to_id': self.bob.pk}}
+                for task in tasks
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._bulk(operations)
+            self.assertEqual(response.json()['updated'], count)
+            return len(ctx.captured_queries)
+
+        run(1)  # pierwsze wiersze liczników dla nowych kluczy
+        self.assertEqual(run(3), run(12))
+
+    def test_tags_are_written_in_bulk(self):
+        def run(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks = [make_task(self.alice, self.team, i) for i in range(count)]
+            operations = [{'op': 'update', 'id': task.pk, 'data': {'tags': ['ops', 'pilne']}} for task in tasks]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._bulk(operations)
+            self.assertEqual(response.json()['updated'], count)
+            for task in tasks:
+                self.assertEqual(sorted(task.tags.names()), ['ops', 'pilne'])
+            return len(ctx.captured_queries)
+
+        run(1)  # tagi tworzone przy pierwszym użyciu
+        self.assertEqual(run(3), run(12))
+        response = self._bulk([{'op': 'update', 'id': self.tasks[0].pk, 'data': {'tags': []}}])
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(list(self.tasks[0].tags.names()), [])
+
+    def test_malformed_or_oversized_batches_are_rejected(self):
+        self.assertEqual(self._bulk({'op': 'delete'}).status_code, 400)
+        for body in ([{'op': 'delete', 'id': self.tasks[0].pk}], {}, "operations"):
+            response = self.client.post(reverse('task-bulk'), body, format='json')
+            self.assertEqual(response.status_code, 400)
+        with self.settings(TASK_BULK_MAX_OPERATIONS=2):
+            response = self._bulk([{'op': 'delete', 'id': task.pk} for task in self.tasks])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.filter(team=self.team).count(), 3)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół O")
+        self.admin = make_user('audytor', is_staff=True)
+        self.worker = make_user('eksportowany', team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tasks = [make_task(self.worker, self.team, i) for i in range(5)]
+        self.tasks[0].tags.add('api', 'audyt')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _export(self, path, **params):
+        response = self.client.get(reverse('export', args=path.split('.')), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    @override_settings(EXPORT_WATERMARK_OVERLAP_SECONDS=0)
+    def test_csv_export_streams_snapshot_with_watermark(self):
+        response, content = self._export('tasks.csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row['id']) for row in rows], [task.pk for task in self.tasks])
+        self.assertEqual(rows[0]['tags'], 'api, audyt')
+        self.assertEqual((rows[0]['assigned_to'], rows[0]['team'], rows[0]['completed']),
+                         ('eksportowany', "Zespół O", 'false'))
+        self.assertEqual(response['X-Export-Watermark'], str(self.tasks[-1].pk))
+
+    @override_settings(EXPORT_WATERMARK_OVERLAP_SECONDS=0)
+    def test_incremental_runs_from_watermark_or_since(self):
+        watermark = self._export('tasks.ndjson')[0]['X-Export-Watermark']
+        self.assertEqual(self._export('tasks.ndjson', after_id=watermark)[1], '')
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = make_task(self.worker, self.team, 7)
+        lines = self._export('tasks.ndjson', after_id=watermark)[1].splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [newer.pk])
+
+        TaskLog.objects.create(task=newer, user=self.worker, change_type='status', old_value='todo', new_value='done')
+        since = (timezone.now() - timedelta(minutes=1)).isoformat()
+        log = json.loads(self._export('logs.ndjson', since=since)[1])
+        self.assertEqual((log['user'], log['new_value']), ('eksportowany', 'done'))
+        response = self.client.get(reverse('export', args=['logs', 'csv']), {'since': 'wczoraj'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_watermark_stays_behind_recent_rows(self):
+        # wiersze młodsze niż zapas mogą mieć jeszcze niezatwierdzonych poprzedników
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:3]]).update(
+            created_at=timezone.now() - timedelta(minutes=5)
+        )
+        with self.settings(EXPORT_WATERMARK_OVERLAP_SECONDS=60):
+            response, content = self._export('tasks.ndjson')
+            self.assertEqual(len(content.splitlines()), 5)
+            self.assertEqual(response['X-Export-Watermark'], str(self.tasks[2].pk))
+            response, content = self._export('tasks.ndjson', after_id=self.tasks[2].pk)
+            self.assertEqual([json.loads(line)['id'] for line in content.splitlines()],
+                             [task.pk for task in self.tasks[3:]])
+            self.assertEqual(response['X-Export-Watermark'], str(self.tasks[2].pk))
+
+    def test_rows_are_read_in_chunks(self):
+        with self.settings(EXPORT_CHUNK_SIZE=2), CaptureQueriesContext(connection) as ctx:
+            self._export('tasks.csv')
+        # tagi dociągane osobno dla każdej paczki (5 wierszy / 2)
+        tag_queries = [q for q in ctx.captured_queries if '"taggit_taggeditem"' in q['sql']]
+        self.assertEqual(len(tag_queries), 3)
+
+    def test_export_requires_staff(self):
+        self.client.force_authenticate(self.worker)
+        response = self.client.get(reverse('export', args=['logs', 'csv']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tasks.ndjson')
+            call_command('export_tasks', format='ndjson', output=path, after_id=str(self.tasks[2].pk),
+                         stderr=io.StringIO())
+            with open(path, encoding='utf-8') as exported:
+                ids = [json.loads(line)['id'] for line in exported]
+        self.assertEqual(ids, [task.pk for task in self.tasks[3:]])
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół P")
+        self.category = Category.objects.create(name="Migracja")
+        self.admin = make_user('importer', is_staff=True)
+        self.alice = make_user('ala_import', team=self.team)
+        self.bob = make_user('bob_import', team=self.team)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _rows(self, count, **extra):
+        due = (timezone.now() + timedelta(days=3)).isoformat()
+        return [
+            {'title': f"Import {i}", 'assigned_to': self.alice.username, 'team': self.team.name,
+             'category': self.category.name, 'due_date': due, 'tags': ['legacy'], **extra}
+            for i in range(count)
+        ]
+
+    def _upload(self, rows, notify='rows'):
+        content = ''.join(json.dumps(row) + '\n' if isinstance(row, dict) else row for row in rows)
+        upload = SimpleUploadedFile('tasks.ndjson', content.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('import-tasks', args=['ndjson']) + f'?notify={notify}', {'file': upload}
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_export_round_trip_through_command(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            original = make_task(self.alice, self.team, 1, category=self.category, status='in_progress')
+        original.tags.add('api', 'legacy', 'front, back', 'dług techniczny')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tasks.csv')
+            call_command('export_tasks', output=path, stderr=io.StringIO())
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('import_tasks', path, stdout=io.StringIO())
+        copy = Task.objects.exclude(pk=original.pk).get()
+        self.assertEqual(
+            (copy.title, copy.assigned_to_id, copy.team_id, copy.category_id, copy.status, copy.due_date),
+            (original.title, original.assigned_to_id, original.team_id, original.category_id,
+             original.status, original.due_date.replace(microsecond=copy.due_date.microsecond)),
+        )
+        self.assertEqual(sorted(copy.tags.names()), ['api', 'dług techniczny', 'front, back', 'legacy'])
+        self.assertEqual(TaskCounter.objects.get(status='in_progress').count, 2)
+        self.assertEqual(Notification.objects.filter(user=self.alice).count(), 2)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        rows = self._rows(2)
+        rows.insert(1, {'title': "Bez terminu", 'assigned_to': self.alice.username, 'team': self.team.name})
+        rows.append({**self._rows(1)[0], 'assigned_to': 'nieznany'})
+        rows.append('{niepoprawny json\n')
+        summary = self._upload(rows)
+        self.assertEqual((summary['rows'], summary['created'], summary['failed']), (5, 2, 3))
+        self.assertEqual([error['row'] for error in summary['errors']], [2, 4, 5])
+        self.assertIn('due_date', summary['errors'][0]['error'])
+        self.assertGreater(summary['rows_per_second'], 0)
+
+    def test_summary_mode_sends_one_notification_per_assignee(self):
+        rows = self._rows(3) + [{**row, 'assigned_to': self.bob.username} for row in self._rows(2)]
+        self._upload(rows, notify='summary')
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', 'message')),
+            [('ala_import', "Zaimportowano zadania przypisane do Ciebie: 3."),
+             ('bob_import', "Zaimportowano zadania przypisane do Ciebie: 2.")],
+        )
+        self.assertEqual(search_tasks(Task.objects.all(), "import", team_id=self.team.pk).count(), 5)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def run(count):
+            with CaptureQueriesContext(connection) as ctx:
+                self._upload(self._rows(count), notify='none')
+            return len(ctx.captured_queries)
+
+        run(1)  # tag i wiersz licznika
+        self.assertEqual(run(3), run(30))
+
+    def test_raw_body_is_imported(self):
+        content = ''.join(json.dumps(row) + '\n' for row in self._rows(3))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('import-tasks', args=['ndjson']) + '?notify=none',
+                content.encode(), content_type='application/x-ndjson',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 3)
+        response = self.client.post(reverse('import-tasks', args=['csv']), b'', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+
+    def test_tags_from_rolled_back_batch_are_recreated(self):
+        task_importer = importer.TaskImporter(notify='none')
+        with mock.patch.object(importer.bulk_created, 'send', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                task_importer.run(self._rows(1, tags=['nowy']))
+        self.assertFalse(Tag.objects.filter(name='nowy').exists())
+        task_importer.run(self._rows(1, tags=['nowy']))
+        self.assertEqual(list(Task.objects.get().tags.names()), ['nowy'])
+
+
+@override_settings(AUTH_SHARED_CACHE=True)
+class AuthContextTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół R")
+        self.other_team = Team.objects.create(name="Zespół S")
+        self.manager = make_user('kontekst', role='manager', team=self.team)
+        self.worker = make_user('pracownik_r', team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team_task = make_task(self.worker, self.team, 1)
+            self.own_task = make_task(self.manager, self.other_team, 2)
+            self.foreign_task = make_task(self.worker, self.other_team, 3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _status(self, task):
+        return self.client.get(reverse('task-detail', args=[task.pk])).status_code
+
+    def test_permission_uses_ids_and_cached_context(self):
+        self._status(self.team_task)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._status(self.team_task), 200)
+        lookups = [
+            q['sql'] for q in ctx.captured_queries
+            if any(f'FROM "{table}" WHERE' in q['sql'] for table in ('tasks_profile', 'tasks_team', 'auth_user'))
+        ]
+        self.assertEqual(lookups, [])
+        self.assertEqual(self.client.get(reverse('current-user-info')).json()['role'], 'manager')
+
+    def test_profile_change_invalidates_context(self):
+        self.assertEqual(self._status(self.team_task), 200)
+        profile = Profile.objects.get(user=self.manager)
+        profile.role = 'employee'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(self._status(self.team_task), 404)
+        self.assertEqual(self._status(self.own_task), 200)
+        self.assertEqual(self._status(self.foreign_task), 404)
+        self.assertEqual(self.client.get(reverse('current-user-info')).json()['role'], 'employee')
+
+
+# testy działają w jednym procesie – LocMemCache jest tu w praktyce współdzielony
+@override_settings(AUTH_SHARED_CACHE=True)
+class StatelessJWTTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół T")
+        self.manager = make_user('bezstanowy', role='manager', team=self.team)
+        self.worker = make_user('pracownik_t', team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task = make_task(self.worker, self.team, 1)
+        # unieważnienia z innych testów (id użytkowników wracają po rollbacku)
+        cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        # unieważnienia są per id użytkownika, a id wracają po rollbacku testu
+        cache.clear()
+
+    def _login(self, user):
+        refresh = ContextRefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        return str(refresh)
+
+    def test_obtained_access_token_carries_role_and_team(self):
+        response = self.client.post(reverse('token_obtain_pair'),
+                                    {'username': 'bezstanowy', 'password': 'haslo12345'}, format='json')
+        access = ContextAccessToken(response.json()['access'])
+        self.assertEqual((access['role'], access['team_id'], access['is_staff']), ('manager', self.team.pk, False))
+
+    def test_requests_do_not_select_user_or_profile(self):
+        self._login(self.manager)
+        for url in (reverse('notification-unread-count'), reverse('task-detail', args=[self.task.pk])):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([q['sql'] for q in ctx.captured_queries
+                              if 'FROM "auth_user" WHERE' in q['sql'] or 'FROM "tasks_profile"' in q['sql']], [])
+        # pola spoza tokenu wczytują użytkownika dopiero na żądanie
+        self.assertEqual(self.client.get(reverse('current-user-info')).json()['username'], 'bezstanowy')
+
+    def test_stale_claims_fall_back_to_database(self):
+        self._login(self.manager)
+        self.assertEqual(self.client.get(reverse('task-detail', args=[self.task.pk])).status_code, 200)
+        Profile.objects.filter(user=self.manager).update(role='employee')
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.get(user=self.manager).save()
+        self.assertEqual(self.client.get(reverse('task-detail', args=[self.task.pk])).status_code, 404)
+
+    def test_claims_are_marked_stale_again_after_commit(self):
+        with mock.patch('tasks.signals.mark_claims_stale') as mark:
+            with self.captureOnCommitCallbacks() as callbacks:
+                Profile.objects.get(user=self.manager).save()
+            self.assertEqual(mark.call_count, 1)
+            for callback in callbacks:
+                callback()
+        self.assertEqual([call.args for call in mark.call_args_list], [(self.manager.pk,)] * 2)
+
+    def test_login_does_not_mark_claims_stale(self):
+        with mock.patch('tasks.signals.mark_claims_stale') as mark, self.captureOnCommitCallbacks(execute=True):
+            self.manager.last_login = timezone.now()
+            self.manager.save(update_fields=['last_login'])
+        mark.assert_not_called()
+
+    def test_revoked_tokens_are_rejected(self):
+        refresh = self._login(self.worker)
+        response = self.client.post(reverse('token_revoke'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).status_code, 401)
+        response = APIClient().post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivated_user_loses_access(self):
+        self._login(self.worker)
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).status_code, 200)
+        self.worker.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.save()
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).status_code, 401)
+
+    def test_login_right_after_revoking_all_tokens_works(self):
+        self._login(self.worker)
+        self.assertEqual(self.client.post(reverse('token_revoke') + '?all=true').status_code, 204)
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).status_code, 401)
+        # nowy token z tej samej sekundy (iat w pełnych sekundach) jest ważny
+        self._login(self.worker)
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).status_code, 200)
+
+    def test_deleted_user_is_rejected_not_an_error(self):
+        self._login(self.worker)
+        # unieważnienie po commicie jeszcze nie dotarło do cache
+        self.worker.delete()
+        self.assertEqual(self.client.get(reverse('current-user-info')).status_code, 401)
+
+    def test_lazy_user_class_check_does_not_query(self):
+        user = LazyUser(self.worker.pk)
+        with self.assertNumQueries(0):
+            self.assertIsInstance(user, User)
+
+    @override_settings(AUTH_SHARED_CACHE=False)
+    def test_local_cache_reads_user_and_role_from_database(self):
+        self._login(self.manager)
+        self.assertEqual(self.client.get(reverse('task-detail', args=[self.task.pk])).status_code, 200)
+        # zmiany z innego procesu – bez sygnałów, lokalny cache o nich nie wie
+        Profile.objects.filter(user=self.manager).update(role='employee')
+        self.assertEqual(self.client.get(reverse('task-detail', args=[self.task.pk])).status_code, 404)
+        User.objects.filter(pk=self.manager.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('task-detail', args=[self.task.pk])).status_code, 401)
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([error.id for error in shared_cache_check(None)], ['tasks.E001'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReadReplicaTests(TestCase):
+    """Druga baza SQLite w pamięci udaje replikę – pusta, więc widać, skąd czytano.
+
+    Alias istnieje tylko na czas tych testów, więc zwykłe uruchomienia i pozostałe
+    testy nie tworzą ani nie migrują drugiej bazy.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings['replica'] = connections.configure_settings({
+            **connections.settings,
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })['replica']
+        call_command('migrate', database='replica', verbosity=0)
+        # dopiero teraz – runner testów przygotowuje bazy z `databases` przed utworzeniem aliasu
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # SQLite ignoruje close() bazy w pamięci – baza znika razem z połączeniem
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół R")
+        self.manager = make_user('replika', role='manager', team=self.team)
+        self.task = make_task(self.manager, self.team, 1)
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {ContextRefreshToken.for_user(self.manager).access_token}"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_safe_requests_read_from_replica(self):
+        with CaptureQueriesContext(connections['replica']) as ctx:
+            response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+        self.assertTrue(ctx.captured_queries)
+        self.assertEqual(self.client.get(reverse('task-dashboard')).json(), [])
+
+    def test_user_reads_own_writes_from_primary_after_writing(self):
+        response = self.client.post(reverse('comment-list'), {'task': self.task.pk, 'content': 'Nowy'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connections['replica']) as ctx:
+            response = self.client.get(reverse('comment-list'))
+        self.assertEqual([comment['content'] for comment in response.json()['results']], ['Nowy'])
+        self.assertEqual(ctx.captured_queries, [])
+
+    def test_rejected_write_does_not_pin(self):
+        response = self.client.post(reverse('comment-list'), {'task': self.task.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with CaptureQueriesContext(connections['replica']) as ctx:
+            self.client.get(reverse('comment-list'))
+        self.assertTrue(ctx.captured_queries)
+
+    def test_check_requires_shared_cache_with_replicas(self):
+        self.assertEqual([error.id for error in replica_cache_check(None)], ['tasks.E001'])
+        self.assertEqual(shared_cache_check(None), [])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(replica_cache_check(None), [])
+
+    def test_reads_outside_viewsets_use_primary(self):
+        self.assertEqual(self.client.get(reverse('current-user-info')).json()['username'], 'replika')
+        self.assertEqual(Task.objects.count(), 1)
+
+
+@override_settings(AUTH_SHARED_CACHE=True)
+class TaskResponseCacheTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół C")
+        self.manager = make_user('kierownik_c', role='manager', team=self.team)
+        self.worker = make_user('pracownik_c', team=self.team)
+        self.task = make_task(self.worker, self.team, 1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _get(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeated_list_and_detail_are_served_from_cache(self):
+        for url in (reverse('task-list') + f'?team={self.team.pk}', reverse('task-detail', args=[self.task.pk])):
+            first = self._get(url)
+            with self.assertNumQueries(0):
+                second = self._get(url)
+            self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+            self.assertEqual(first.content, second.content)
+
+    def test_writes_invalidate_cached_responses(self):
+        url = reverse('task-list')
+        self._get(url)
+        response = self.client.patch(reverse('task-detail', args=[self.task.pk]), {'title': 'Nowy tytuł'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self._get(url)
+        self.assertEqual((response['X-Cache'], response.json()['results'][0]['title']), ('MISS', 'Nowy tytuł'))
+
+        self.task.tags.add('pilne')
+        self.assertEqual(self._get(url).json()['results'][0]['tags'], ['pilne'])
+        self.worker.profile.role = 'manager'
+        self.worker.profile.save()
+        self.assertEqual(self._get(url).json()['results'][0]['assigned_to']['role'], 'manager')
+
+    def test_cache_is_per_visibility_scope(self):
+        other = make_user('pracownik_d', team=self.team)
+        make_task(other, self.team, 2)
+        self.assertEqual(len(self._get(reverse('task-list')).json()['results']), 2)
+        client = APIClient()
+        client.force_authenticate(other)
+        response = self._get(reverse('task-list'), client)
+        self.assertEqual((response['X-Cache'], len(response.json()['results'])), ('MISS', 1))
+
+    def test_hit_and_miss_counters(self):
+        before = response_cache.stats(['task-list'])['task-list']
+        self._get(reverse('task-list'))
+        self._get(reverse('task-list'))
+        after = response_cache.stats(['task-list'])['task-list']
+        self.assertEqual((after['hit'] - before['hit'], after['miss'] - before['miss']), (1, 1))
+
+
+class ORJSONRendererTests(TestCase):
+
+    def _payload(self):
+        return {
+            'results': [{
+                'due_date': timezone.now(),
+                'created': timezone.localtime(timezone.now()),
+                'day': timezone.now().date(),
+                'amount': Decimal('12.50'),
+                'title': "Zażółć\u2028gęślą",
+                'label': gettext_lazy("Zadanie"),
+                'tags': ('api', 'pilne'),
+                1: None,
+            }],
+        }
+
+    def test_renderer_output_matches_drf_json_renderer(self):
+        payload = self._payload()
+        self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(ORJSONRenderer().render(payload, 'application/json; indent=2'),
+                         JSONRenderer().render(payload, 'application/json; indent=2'))
+        with mock.patch('tasks.renderers.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO('{"a": [1, "ż"]}'.encode())), {'a': [1, 'ż']})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+        latin = {'encoding': 'latin-1'}
+        self.assertEqual(ORJSONParser().parse(io.BytesIO('{"a": "ó"}'.encode('latin-1')), parser_context=latin), {'a': 'ó'})
+
+    def test_api_uses_orjson_classes(self):
+        user = make_user('orjson')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(reverse('comment-list'), '{"content": 1', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+
+    @override_settings(TASK_RESPONSE_CACHE_TIMEOUT=0)
+    def test_api_without_orjson_renders_same_bytes(self):
+        user = make_user('bez_orjson')
+        make_task(user, Team.objects.create(name="Zespół J"))
+        client = APIClient()
+        client.force_authenticate(user)
+        fast = client.get(reverse('task-list'))
+        with mock.patch('tasks.renderers.orjson', None):
+            fallback = client.get(reverse('task-list'))
+            parsed = ORJSONParser().parse(io.BytesIO(fast.content))
+        self.assertFalse(fallback.has_header('X-Cache'))
+        self.assertEqual(fallback.content, fast.content)
+        self.assertEqual(parsed, json.loads(fast.content))
+
+
+@override_settings(RESPONSE_COMPRESSION=['br', 'gzip'], RESPONSE_COMPRESSION_MIN_SIZE=500)
+class CompressionAndETagTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół K")
+        self.admin = make_user('kompresja', role='manager', team=self.team, is_staff=True)
+        for i in range(10):
+            make_task(self.admin, self.team, i)
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_large_json_is_gzipped_and_counted(self):
+        plain = self.client.get(reverse('task-list'))
+        response = self.client.get(reverse('task-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], plain['ETag'])
+        stats = compression_stats()['task-list']
+        self.assertEqual((stats['responses'], stats['original']), (1, len(plain.content)))
+        self.assertEqual(stats['compressed'], len(response.content))
+        output = io.StringIO()
+        call_command('compression_report', stdout=output)
+        self.assertIn('task-list', output.getvalue())
+
+    def test_brotli_is_preferred_when_installed(self):
+        plain = self.client.get(reverse('task-list'))
+        with mock.patch('tasks.middleware.brotli', None):
+            response = self.client.get(reverse('task-list'), HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        # zamiast pakietu brotli (opcjonalny) – gzip pod nazwą br wystarczy do sprawdzenia negocjacji
+        fake = mock.Mock(compress=mock.Mock(side_effect=lambda content, quality: gzip.compress(content)))
+        with mock.patch('tasks.middleware.brotli', fake), override_settings(RESPONSE_COMPRESSION_BROTLI_QUALITY=7):
+            response = self.client.get(reverse('task-list'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(fake.compress.call_args.kwargs, {'quality': 7})
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_refused_and_streaming_responses_are_not_compressed(self):
+        responses = [
+            self.client.get(reverse('notification-unread-count'), HTTP_ACCEPT_ENCODING='gzip'),
+            self.client.get(reverse('task-list'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity'),
+            self.client.get(reverse('export', args=['tasks', 'csv']), HTTP_ACCEPT_ENCODING='gzip'),
+        ]
+        self.assertTrue(responses[2].streaming)
+        for response in responses:
+            self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(responses[2].has_header('ETag'))
+
+    def test_weak_etag_and_not_modified(self):
+        response = self.client.get(reverse('task-list'))
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        response = self.client.get(reverse('task-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        # ETag z widoku (słowniki) po kompresji staje się słaby i nadal pasuje
+        Category.objects.bulk_create([Category(name=f"Kategoria {i}") for i in range(30)])
+        response = self.client.get(reverse('bootstrap'), HTTP_ACCEPT_ENCODING='gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(reverse('bootstrap'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+
+@override_settings(REQUEST_METRICS_FLUSH_SECONDS=0, TASK_RESPONSE_CACHE_TIMEOUT=0, METRICS_TOKEN='', SERVER_TIMING=True)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Zespół M")
+        self.admin = make_user('metryki', role='manager', team=self.team, is_staff=True)
+        for i in range(3):
+            make_task(self.admin, self.team, i)
+        # przyrosty z innych testów (dłuższy interwał zapisu) – przed wyczyszczeniem cache
+        instrumentation._pending.flush()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_and_log_line(self):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('tasks.requests', 'INFO') as logs:
+            response = self.client.get(reverse('task-list'))
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{len(queries)} queries, 0 duplicated", app;dur=[\d.]+$')
+        self.assertIn('handler=TaskViewSet.list method=GET path=/api/tasks/ status=200', logs.output[0])
+        self.assertIn(f'queries={len(queries)} duplicates=0', logs.output[0])
+        self.assertEqual(logs.records[0].request_metrics['queries'], len(queries))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        with self.assertLogs('tasks.requests', 'INFO') as logs:
+            response = self.client.get(reverse('task-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertIn('handler=TaskViewSet.list', logs.output[0])
+
+    def test_duplicate_queries_are_counted(self):
+        recorder = instrumentation.QueryRecorder()
+        for sql in ('SELECT 1', 'SELECT 2', 'SELECT 1', 'SELECT 1'):
+            recorder.add(sql, 0.001)
+        self.assertEqual((recorder.queries, recorder.duplicates), (4, 2))
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('task-list'))
+        self.client.get(reverse('task-detail', args=[Task.objects.first().pk]))
+        self.client.get('/api/nie-ma/')
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('teammanager_http_request_duration_seconds_count{handler="TaskViewSet.list"} 1', text)
+        self.assertIn('teammanager_http_request_duration_seconds_bucket{handler="TaskViewSet.retrieve",le="+Inf"} 1', text)
+        self.assertIn('teammanager_http_responses_total{handler="other",status="4xx"} 1', text)
+        self.assertRegex(text, r'teammanager_db_queries_total\{handler="TaskViewSet.list"\} [1-9]')
+        # kubełki skumulowane, ostatni równy liczbie żądań
+        buckets = [int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+                   if line.startswith('teammanager_http_request_duration_seconds_bucket{handler="TaskViewSet.list"')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 1)
+
+    @override_settings(METRICS_TOKEN='sekret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer sekret')
+        self.assertEqual(response.status_code, 200)
+
+class RegisterTests(TestCase):
+
+    def test_register_sets_role_on_signal_created_profile(self):
+        response = APIClient().post(reverse('register'), {
+            'username': 'nowy',
+            'password': 'haslo12345',
+            'email': 'nowy@example.com',
+            'role': 'manager',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Profile.objects.get(user__username='nowy').role, 'manager')
@@ -0,0 +1,174 @@
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authz import AuthContext, load_auth_context
+
+# Tokeny JWT z rolą i zespołem w claimach (rola/zespół zawsze świeże z bazy
+# przy wydaniu tokenu dostępu) oraz lista unieważnień w cache:
+#   - pojedynczy token po jti (do końca jego ważności),
+#   - wszystkie tokeny użytkownika wydane przed daną chwilą,
+#   - claimy wydane przed zmianą profilu – token ważny, ale rola/zespół
+#     brane z bazy (authz.get_auth_context), dopóki nie wygaśnie.
+
+CONTEXT_CLAIMS = ('role', 'team_id', 'is_staff', 'is_superuser')
+
+
+def _deny_key(jti):
+    return f"tasks:jwt:deny:{jti}"
+
+
+def _revoked_key(user_id):
+    return f"tasks:jwt:revoked:{user_id}"
+
+
+def _stale_key(user_id):
+    return f"tasks:jwt:stale:{user_id}"
+
+
+def _user_keys_timeout():
+    # żaden token wydany wcześniej nie przeżyje refresh tokenu
+    return int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+def deny_token(token):
+    """Unieważnia jeden token (po jti) do końca jego ważności."""
+    remaining = int(token['exp'] - time.time())
+    if remaining > 0:
+        cache.set(_deny_key(token[api_settings.JTI_CLAIM]), True, timeout=remaining)
+
+
+# `iat` ma pełne sekundy, więc nie odróżnia tokenu sprzed unieważnienia od tokenu
+# z ponownego logowania w tej samej sekundzie. Tokeny niosą dlatego własny,
+# dokładny czas wydania (ISSUED_CLAIM); `iat` tylko dla tokenów wydanych bez niego.
+
+ISSUED_CLAIM = 'issued'
+
+
+def _issued_at(payload):
+    return payload.get(ISSUED_CLAIM, payload.get('iat', 0))
+
+
+def revoke_user_tokens(user_id):
+    """Unieważnia wszystkie dotychczas wydane tokeny użytkownika."""
+    cache.set(_revoked_key(user_id), time.time(), timeout=_user_keys_timeout())
+
+
+def mark_claims_stale(user_id):
+    """Rola/zespół w wydanych tokenach są nieaktualne – tokeny pozostają ważne."""
+    cache.set(_stale_key(user_id), time.time(), timeout=_user_keys_timeout())
+
+
+def add_context_claims(token, user_id):
+    context = load_auth_context(user_id)
+    for claim, value in zip(CONTEXT_CLAIMS, context.as_tuple()[1:]):
+        token[claim] = value
+
+
+def _revocation_state(payload):
+    """(unieważniony, claimy aktualne) dla claimów tokenu – jedno get_many z cache."""
+    user_id = payload.get(api_settings.USER_ID_CLAIM)
+    keys = [_deny_key(payload.get(api_settings.JTI_CLAIM))]
+    if user_id is not None:
+        keys += [_revoked_key(user_id), _stale_key(user_id)]
+    found = cache.get_many(keys)
+    issued_at = _issued_at(payload)
+    if keys[0] in found:
+        return True, False
+    if user_id is None:
+        return False, False
+    if issued_at < found.get(_revoked_key(user_id), 0):
+        return True, False
+    return False, issued_at >= found.get(_stale_key(user_id), 0)
+
+
+def is_revoked(payload):
+    """Czy token o tych claimach został unieważniony (wygaśnięcie sprawdza wywołujący)."""
+    return _revocation_state(payload)[0]
+
+
+class RevocableTokenMixin:
+    """verify() sprawdza też listę unieważnień – jedno get_many z cache."""
+
+    claims_fresh = False
+
+    def __init__(self, token=None, verify=True):
+        super().__init__(token, verify)
+        if token is None:
+            self.payload[ISSUED_CLAIM] = time.time()
+
+    def verify(self):
+        super().verify()
+        revoked, self.claims_fresh = _revocation_state(self.payload)
+        if revoked:
+            raise TokenError("Token został unieważniony.")
+
+
+class ContextAccessToken(RevocableTokenMixin, AccessToken):
+
+    def get_auth_context(self):
+        """AuthContext z claimów albo None (stary token lub claimy sprzed zmiany profilu)."""
+        if not self.claims_fresh or any(claim not in self.payload for claim in CONTEXT_CLAIMS):
+            return None
+        user_id = User._meta.pk.to_python(self.payload[api_settings.USER_ID_CLAIM])
+        return AuthContext(user_id, *(self.payload[claim] for claim in CONTEXT_CLAIMS))
+
+
+class ContextRefreshToken(RevocableTokenMixin, RefreshToken):
+    access_token_class = ContextAccessToken
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        # skopiowany z refresh tokenu czas wydania byłby starszy niż claimy poniżej
+        access[ISSUED_CLAIM] = time.time()
+        # claimy z bazy przy każdym wydaniu – refresh żyje dłużej niż rola
+        add_context_claims(access, self.payload[api_settings.USER_ID_CLAIM])
+        return access
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    token_class = ContextRefreshToken
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = ContextRefreshToken
+
+
+# Bilety strumienia powiadomień: EventSource nie wysyła nagłówków, a token JWT
+# w query stringu trafiałby do logów. Bilet jest losowy, jednorazowy i krótko
+# ważny; niesie claimy tokenu, z którego go wydano, żeby strumień mógł
+# okresowo sprawdzać wygaśnięcie i unieważnienie.
+
+STREAM_TICKET_CLAIMS = (api_settings.USER_ID_CLAIM, api_settings.JTI_CLAIM, 'iat', ISSUED_CLAIM, 'exp')
+
+
+def _ticket_key(ticket):
+    return f"tasks:stream:ticket:{ticket}"
+
+
+def issue_stream_ticket(token):
+    ticket = secrets.token_urlsafe(32)
+    claims = {claim: token.payload[claim] for claim in STREAM_TICKET_CLAIMS if claim in token.payload}
+    cache.set(_ticket_key(ticket), claims, timeout=settings.NOTIFICATION_STREAM_TICKET_SECONDS)
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """Claimy tokenu, z którego wydano bilet, albo None; bilet działa raz."""
+    key = _ticket_key(ticket)
+    claims = cache.get(key)
+    # delete zwraca False, gdy równoległe żądanie zużyło bilet pierwsze
+    if claims is None or not cache.delete(key):
+        return None
+    return claims
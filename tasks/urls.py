@@ -13,7 +13,12 @@ from .views import (
     TaskPriorityOptionViewSet,
     TaskStatusOptionViewSet,
     CurrentUserInfoView,
+    BootstrapView,
+    ExportView,
+    ImportView,
+    TokenRevokeView,
     GoogleOAuthInitView,
+    notification_stream,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -32,11 +37,17 @@ router.register(r'priorities', TaskPriorityOptionViewSet, basename='priority')
 router.register(r'statuses', TaskStatusOptionViewSet, basename='status')
 
 urlpatterns = [
+    # przed routerem – inaczej "stream" trafiłby w notifications/<pk>/
+    path('notifications/stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('google/auth-url/', GoogleOAuthInitView.as_view(), name='google_auth_url'),
     path('me/', CurrentUserInfoView.as_view(), name='current-user-info'),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
+    path('export/<str:dataset>.<str:file_format>', ExportView.as_view(), name='export'),
+    path('import/tasks.<str:file_format>', ImportView.as_view(), name='import-tasks'),
 
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
 ]
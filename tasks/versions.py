@@ -0,0 +1,74 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .batching import pending_on_commit
+
+# Wersje tabel trzymane we współdzielonym cache Django. Każdy zapis w tabeli
+# ustawia nowy losowy token (sygnały w signals.py), więc porównanie wersji
+# nie wymaga zapytań do bazy. Po wyczyszczeniu cache powstaje nowy token,
+# co najwyżej unieważniając zbyt wiele.
+
+
+def _key(name):
+    return f"tasks:version:{name}"
+
+
+def get_versions(names):
+    keys = {name: _key(name) for name in names}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(key)
+        versions[name] = version
+    return versions
+
+
+def get_version(name):
+    return get_versions([name])[name]
+
+
+def bump_version(name):
+    cache.set(_key(name), uuid.uuid4().hex, timeout=None)
+
+
+class _PendingBumps:
+    """Nazwy do podbicia po commicie – jedno on_commit na poziom savepointu."""
+
+    def __init__(self):
+        self.names = set()
+        self.flushed = False
+
+    def flush(self):
+        self.flushed = True
+        for name in self.names:
+            bump_version(name)
+
+
+def bump_version_on_commit(name, using=None):
+    """Nowa wersja od razu i jeszcze raz po commicie.
+
+    Równoległe żądanie mogło między tymi chwilami zapamiętać stan sprzed
+    transakcji pod nową wersją – drugie podbicie go unieważnia.
+    """
+    bump_version(name)
+    if not transaction.get_connection(using).in_atomic_block:
+        return
+    pending_on_commit('version_bumps', _PendingBumps, using=using).names.add(name)
+
+
+def version_digest(names, *extra):
+    """Skrót wersji podanych tabel (i dodatkowych wartości, np. ścieżki)."""
+    versions = get_versions(names)
+    parts = [f"{name}={versions[name]}" for name in names] + [str(value) for value in extra]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def make_etag(names, *extra):
+    """Silny ETag z wersji podanych tabel (i np. ścieżki z query stringiem)."""
+    return '"%s"' % version_digest(names, *extra)
@@ -1,17 +1,28 @@
+import asyncio
+import csv
+import json
 import logging
+import time
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db.models import Count
-from django.http import JsonResponse
+from django.db.models import Count, Prefetch
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags
 from google_auth_oauthlib.flow import Flow
 from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from datetime import timedelta
 
 from .models import (
     Task,
@@ -25,6 +36,7 @@ from .models import (
     TaskPriorityOption,
     TaskStatusOption,
     GoogleOAuthState,
+    TaskCounter,
 )
 from .serializers import (
     TaskSerializer,
@@ -38,25 +50,143 @@ from .serializers import (
     NotificationSerializer,
     TaskPriorityOptionSerializer,
     TaskStatusOptionSerializer,
+    BulkRequestSerializer,
+    TASK_LIST_VALUES,
+    task_list_rows,
 )
 from .permissions import IsTeamManagerOrAssigned
-from .utils import send_task_notification
-from .google_integration import get_calendar_service
+from .authz import get_auth_context
+from .tokens import (
+    ContextAccessToken,
+    ContextRefreshToken,
+    deny_token,
+    is_revoked,
+    issue_stream_ticket,
+    redeem_stream_ticket,
+    revoke_user_tokens,
+)
+from .filters import TaskFilter, TaskSearchFilter, TaskOrderingFilter
+from .pagination import (
+    KeysetPagination,
+    CommentPagination,
+    TaskLogPagination,
+)
+from .outbox import enqueue_task_created
+from .batching import atomic_batch
+from .bulk import run_bulk_operations
+from . import export, importer
+from . import counters, instrumentation, response_cache, routers
+from .broker import get_broker, publish_unread_delta
+from .versions import make_etag
+from .google_integration import (
+    get_calendar_service,
+    credentials_to_dict,
+    sync_task_event,
+    sync_tasks_to_calendar,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
 
+class ConditionalGetMixin:
+    """list/retrieve z silnym ETagiem z wersji tabel (versions.py).
+
+    Gdy `If-None-Match` pasuje, odpowiada 304 bez zapytań do tych tabel.
+    """
+    version_names = ()
+
+    def conditional_response(self, request, render):
+        etag = make_etag(self.version_names, request.get_full_path())
+        # porównanie słabe – po kompresji (middleware) klient odsyła W/"..."
+        if_none_match = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+
+class ReplicaReadMixin:
+    """Bezpieczne żądania czytają z repliki (routers.py), chyba że użytkownik
+    niedawno coś zapisał – zapis przypina go do bazy głównej.
+
+    Nie łączyć z ConditionalGetMixin: ETag z bieżącej wersji i treść z opóźnionej
+    repliki utrwaliłyby nieaktualną odpowiedź w cache klienta.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with routers.read_from(None):
+            response = super().dispatch(request, *args, **kwargs)
+            # leniwe querysety w Response.data (np. dashboard) – na tej samej bazie
+            return response.render() if hasattr(response, 'render') else response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            routers.use_replica(routers.choose_replica(request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # tylko udany zapis – odrzucone żądanie niczego nie zmieniło
+        if request.method not in permissions.SAFE_METHODS and response.status_code < 400:
+            routers.pin_to_primary(request.user.pk)
+        return response
+
+
+class CachedResponseMixin:
+    """Odpowiedzi z cache (response_cache.py) – cached_response() w list/retrieve widoku.
+
+    Odpowiedź 200 w JSON zapamiętywana jest dla zakresu widoczności `scope`
+    i ścieżki z query stringiem; nagłówek X-Cache: HIT/MISS.
+    """
+    cache_generations = ()
+
+    def cached_response(self, request, render, scope):
+        if not settings.TASK_RESPONSE_CACHE_TIMEOUT or request.accepted_renderer.format != 'json':
+            return render()
+        # wpisy z repliki osobno i krótko – przypięty do bazy głównej użytkownik
+        # nie może dostać odpowiedzi sprzed własnego zapisu
+        replica = routers.reading_from_replica()
+        key = response_cache.make_key(
+            self.cache_generations, scope, replica, request.get_host(), request.get_full_path()
+        )
+        name = f"{self.basename}-{self.action}"
+        data = response_cache.lookup(key, name)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = render()
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.store(key, response.data, timeout=settings.REPLICA_PIN_SECONDS if replica else None)
+            response['X-Cache'] = 'MISS'
+        return response
+
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
     
 
-class TeamViewSet(viewsets.ModelViewSet):
-    queryset = Team.objects.all()
+class TeamViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Team.objects.prefetch_related(
+        Prefetch('members', queryset=User.objects.only('id'))
+    )
     serializer_class = TeamSerializer
+    version_names = ('team',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -66,9 +196,10 @@ class TeamViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    version_names = ('category',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -78,67 +209,152 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ReplicaReadMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsTeamManagerOrAssigned]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['completed', 'team', 'due_date', 'status', 'category', 'priority']
+    pagination_class = KeysetPagination
+    # TaskOrderingFilter jako jedyny ma get_ordering – z niego korzysta paginacja
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, TaskOrderingFilter]
+    filterset_class = TaskFilter
+    cache_generations = response_cache.TASK_GENERATIONS
 
 
-    def get_queryset(self):
-        user = self.request.user
+    def get_visible_tasks(self):
+        """Zadania widoczne dla bieżącego użytkownika (bez dociągania relacji)."""
+        context = get_auth_context(self.request)
 
-        if user.is_superuser:
+        if context.is_superuser:
             return Task.objects.all()
         
-        if not hasattr(user, 'profile'):
+        if not context.has_profile:
             return Task.objects.none()
-        
-        profile = user.profile
 
-        if profile.role == 'manager':
-            return Task.objects.filter(team=profile.team)
+        if context.is_manager:
+            return Task.objects.filter(team_id=context.team_id)
         
-        return Task.objects.filter(assigned_to=user)
+        return Task.objects.filter(assigned_to_id=context.user_id)
+
+    def get_search_scope(self):
+        """Zawężenie indeksu wyszukiwania do zadań widocznych dla użytkownika."""
+        context = get_auth_context(self.request)
+        if context.is_superuser:
+            return {}
+        if context.is_manager:
+            return {'team_id': context.team_id}
+        return {'assignee_id': context.user_id}
+
+    def get_cache_scope(self):
+        # ten sam zakres widoczności -> te same zadania
+        return sorted(self.get_search_scope().items())
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: self.list_rows(request), self.get_cache_scope())
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(TaskViewSet, self).retrieve(request, *args, **kwargs),
+                                    self.get_cache_scope())
+
+    def list_rows(self, request):
+        """Lista bez TaskSerializer – wiersze z .values() (serializers.task_list_rows)."""
+        queryset = self.filter_queryset(self.get_visible_tasks())
+        # adnotacje (np. search_rank) potrzebne paginacji kursorowej
+        values = queryset.values(*TASK_LIST_VALUES, *queryset.query.annotations)
+        page = self.paginate_queryset(values)
+        if page is None:
+            return Response(task_list_rows(list(values)))
+        return self.get_paginated_response(task_list_rows(page))
+
+    def get_queryset(self):
+        # relacje dociągane zgodnie z tym, co czyta TaskSerializer:
+        # assigned_to (+ profile.role), team (+ members PK), category, tags
+        return self.get_visible_tasks().select_related(
+            'assigned_to__profile', 'team', 'category'
+        ).prefetch_related(
+            Prefetch('team__members', queryset=User.objects.only('id')),
+            'tags',
+        )
     
+    def get_visible_counters(self):
+        """Liczniki dashboardu w tym samym zakresie co get_visible_tasks."""
+        context = get_auth_context(self.request)
+
+        if context.is_superuser:
+            return TaskCounter.objects.all()
+
+        if not context.has_profile:
+            return TaskCounter.objects.none()
+
+        if context.is_manager:
+            return TaskCounter.objects.filter(team_id=context.team_id)
+
+        return TaskCounter.objects.filter(assignee_id=context.user_id)
+
     @action(detail=False, methods=["get"])
     def dashboard(self, request):
-        user = request.user
-        queryset = self.get_queryset()
+        """Podsumowanie zadań z liczników TaskCounter.
+
+        `?group_by=status,priority,completed` wybiera przekrój (domyślnie status),
+        `?overdue=true` liczy tylko zaległe, niezakończone zadania.
+        """
+        group_by = [field for field in request.query_params.get('group_by', 'status').split(',') if field]
+        if not group_by or any(field not in counters.GROUP_FIELDS for field in group_by):
+            return Response(
+                {"detail": f"group_by: dozwolone pola to {', '.join(counters.GROUP_FIELDS)}."},
+                status=400,
+            )
+
+        if request.query_params.get('overdue') == 'true':
+            # zaległość zależy od bieżącej chwili, więc nie da się jej trzymać w licznikach
+            summary = (
+                self.get_visible_tasks()
+                .filter(completed__in=[False], due_date__lt=timezone.now())  # IN – patrz TaskFilter.filter_completed
+                .values(*group_by)
+                .annotate(count=Count('id'))
+                .order_by(*group_by)
+            )
+            return Response(summary)
 
-        summary = queryset.values('status').annotate(count=Count('id'))
+        summary = counters.summarize(self.get_visible_counters(), group_by)
         return Response(summary)
     
     def perform_create(self, serializer):
-        task = serializer.save()
-        if task.assigned_to and task.assigned_to.email:  
-            send_task_notification(task, task.assigned_to.email)
-
-        self._auto_sync_calendar(task)
-
-    def _auto_sync_calendar(self, task):
-        """Próbuje od razu utworzyć wydarzenie w kalendarzu Google przypisanego użytkownika."""
-        assigned_user = task.assigned_to
-        if not assigned_user or not task.due_date:
-            return
-        service = get_calendar_service(assigned_user)
-        if not service:
-            return
-        start_iso = task.due_date.isoformat()
-        end_iso = (task.due_date + timedelta(hours=1)).isoformat()
-        body = {
-            "summary": task.title,
-            "description": task.description or "",
-            "start": {"dateTime": start_iso, "timeZone": "Europe/Warsaw"},
-            "end": {"dateTime": end_iso, "timeZone": "Europe/Warsaw"},
-        }
-        try:
-            service.events().insert(calendarId="primary", body=body).execute()
-            logger.info("Utworzono automatyczne wydarzenie Google Calendar dla zadania %s", task.pk)
-        except Exception as exc:  # pragma: no cover - logowanie błędów integracji
-            logger.warning("Nie udało się zsynchronizować zadania %s z kalendarzem: %s", task.pk, exc)
-
+        # e-mail i kalendarz idą przez outbox – zapis w tej samej transakcji,
+        # wysyłkę robi `manage.py run_outbox`
+        with atomic_batch():
+            task = serializer.save()
+            enqueue_task_created([task])
+
+    def perform_update(self, serializer):
+        # log zmian i powiadomienia zapisują się zbiorczo na końcu transakcji
+        with atomic_batch():
+            serializer.save()
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Wiele operacji create/update/delete w jednym żądaniu i jednej transakcji.
+
+        Treść: `{"operations": [{"op": "update", "id": 1, "data": {...}}, ...]}`.
+        Odpowiedź zawiera wynik każdej operacji; błędne są pomijane.
+        """
+        body = BulkRequestSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        results = run_bulk_operations(body.validated_data["operations"], request, self.get_visible_tasks())
+
+        summary = {op: 0 for op in ("create", "update", "delete")}
+        failed = 0
+        for result in results:
+            if result["status"] == "ok":
+                summary[result["op"]] += 1
+            else:
+                failed += 1
+        return Response({
+            "created": summary["create"],
+            "updated": summary["update"],
+            "deleted": summary["delete"],
+            "failed": failed,
+            "results": results,
+        })
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def sync_calendar(self, request, pk=None):
@@ -146,7 +362,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 
         # tylko przypisany użytkownik albo staff/admin
         user = request.user
-        if not (user.is_staff or task.assigned_to == user):
+        if not (user.is_staff or task.assigned_to_id == user.pk):
             return Response({"detail": "Brak dostępu do tego zadania."}, status=403)
 
         service = get_calendar_service(user)
@@ -162,26 +378,8 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=400,
             )
 
-        # zakładam, że due_date to DateTimeField
-        start_iso = task.due_date.isoformat()
-        # kończymy np. godzinę później
-        end_iso = (task.due_date + timedelta(hours=1)).isoformat()
-
-        event_body = {
-            "summary": task.title,
-            "description": task.description or "",
-            "start": {
-                "dateTime": start_iso,
-                "timeZone": "Europe/Warsaw",  # ewentualnie z settings.TIME_ZONE
-            },
-            "end": {
-                "dateTime": end_iso,
-                "timeZone": "Europe/Warsaw",
-            },
-        }
-
         try:
-            event = service.events().insert(calendarId="primary", body=event_body).execute()
+            event, created = sync_task_event(service, user, task)
         except Exception as exc:  # pragma: no cover - obsługa błędów API Google
             logger.warning("Błąd synchronizacji zadania %s z kalendarzem: %s", task.pk, exc)
             return Response(
@@ -191,24 +389,69 @@ class TaskViewSet(viewsets.ModelViewSet):
 
         return Response(
             {
-                "detail": "Utworzono wydarzenie w Google Calendar.",
+                "detail": "Utworzono wydarzenie w Google Calendar." if created else "Zaktualizowano wydarzenie w Google Calendar.",
                 "event_id": event.get("id"),
                 "html_link": event.get("htmlLink"),
             }
         )
 
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def sync_calendar_bulk(self, request):
+        """Synchronizuje wiele zadań naraz (paczki Google batch HTTP).
+
+        Zadania wybiera się filtrami listy w query stringu i/lub `{"ids": [...]}` w treści.
+        Zadania zsynchronizowane wcześniej do kalendarza wywołującego są aktualizowane, a nie dublowane.
+        """
+        user = request.user
+        service = get_calendar_service(user)
+        if not service:
+            return Response(
+                {"detail": "Użytkownik nie ma połączonego konta Google."},
+                status=400,
+            )
+
+        queryset = self.filter_queryset(self.get_visible_tasks())
+        # jak w sync_calendar: tylko własne zadania, chyba że staff/admin
+        if not user.is_staff:
+            queryset = queryset.filter(assigned_to=user)
+
+        ids = request.data.get("ids")
+        if ids is not None:
+            # bool to podklasa int – True nie może znaczyć zadania nr 1
+            if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+                return Response({"detail": "Pole 'ids' musi być listą liczb."}, status=400)
+            queryset = queryset.filter(pk__in=ids)
+
+        try:
+            results = sync_tasks_to_calendar(service, user, queryset.order_by('pk'))
+        except Exception as exc:  # pragma: no cover - obsługa błędów API Google
+            logger.warning("Błąd zbiorczej synchronizacji z kalendarzem: %s", exc)
+            return Response(
+                {"detail": "Wystąpił błąd po stronie Google Calendar."},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+
+        failed = sum(1 for item in results if item["status"] == "error")
+        return Response({
+            "synced": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        })
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CommentPagination
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with atomic_batch():
+            serializer.save(author=self.request.user)
 
     def get_queryset(self):
         queryset = Comment.objects.all()
@@ -218,10 +461,11 @@ class CommentViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class TaskLogViewSet(viewsets.ModelViewSet):
+class TaskLogViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = TaskLog.objects.all()
     serializer_class = TaskLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskLogPagination
 
 
 class ProfileViewSet(viewsets.ModelViewSet):
@@ -233,13 +477,15 @@ class ProfileViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
    
     def get_queryset(self):
-        qs = Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        # po id – bez wczytywania użytkownika (LazyUser z tokenu)
+        qs = Notification.objects.filter(user_id=self.request.user.pk).order_by('-created_at')
         is_read = self.request.query_params.get('is_read')
         if is_read in ('true', 'false'):
             qs = qs.filter(is_read=(is_read == 'true'))
@@ -247,27 +493,128 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
+        count = Notification.objects.filter(user_id=request.user.pk, is_read=False).count()
         return Response({'unread': count})
 
+    @action(detail=False, methods=['post'], url_path='stream-ticket')
+    def stream_ticket(self, request):
+        """Jednorazowy bilet do `/api/notifications/stream/?ticket=` zamiast tokenu JWT w URL."""
+        if not hasattr(request.auth, 'payload'):
+            return Response({"detail": "Bilet wydawany jest tylko dla tokenu JWT."}, status=400)
+        return Response({
+            "ticket": issue_stream_ticket(request.auth),
+            "expires_in": settings.NOTIFICATION_STREAM_TICKET_SECONDS,
+        })
+
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        updated = Notification.objects.filter(user_id=request.user.pk, is_read=False).update(is_read=True)
+        publish_unread_delta(request.user.pk, -updated)
         return Response({'updated': updated})
 
     
     @action(detail=True, methods=['post'], url_path='mark-as-read')
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
+        was_unread = not notification.is_read
         notification.is_read = True
         notification.save()
+        if was_unread:
+            publish_unread_delta(request.user.pk, -1)
 
         return Response({"status": "marked as read"}, status=status.HTTP_200_OK)
 
 
-class TaskPriorityOptionViewSet(viewsets.ModelViewSet):
+def _sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def _stream_token_valid(claims):
+    exp = claims.get('exp')
+    if (exp is not None and exp <= time.time()) or is_revoked(claims):
+        return False
+    if not settings.AUTH_SHARED_CACHE:
+        # unieważnienie z innego procesu nie trafia do lokalnego cache – stan konta z bazy
+        return User.objects.filter(pk=claims.get(api_settings.USER_ID_CLAIM), is_active=True).exists()
+    return True
+
+
+async def _notification_events(user_id, unread, claims):
+    subscription = get_broker().subscribe(user_id)
+    next_check = time.monotonic() + settings.NOTIFICATION_STREAM_RECHECK_SECONDS
+    try:
+        yield _sse("unread_count", {"unread": unread})
+        while True:
+            exp = claims.get('exp')
+            # czekamy najwyżej do keep-alive, kontroli tokenu albo jego wygaśnięcia
+            timeout = min(
+                settings.NOTIFICATION_STREAM_KEEPALIVE,
+                max(next_check - time.monotonic(), 0),
+                max(exp - time.time(), 0) if exp is not None else settings.NOTIFICATION_STREAM_KEEPALIVE,
+            )
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                event = None
+            if time.monotonic() >= next_check or (exp is not None and exp <= time.time()):
+                next_check = time.monotonic() + settings.NOTIFICATION_STREAM_RECHECK_SECONDS
+                if not await sync_to_async(_stream_token_valid)(claims):
+                    # klient pobiera nowy bilet (z odświeżonym tokenem) i łączy się ponownie
+                    yield _sse("token_expired", {})
+                    return
+            if event is None:
+                # komentarz SSE – utrzymuje połączenie przez proxy
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event["type"], event["data"])
+    finally:
+        get_broker().unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    """Strumień SSE nowych powiadomień i zmian licznika nieprzeczytanych.
+
+    Token JWT w nagłówku Authorization albo jednorazowy bilet w `?ticket=`
+    (POST /api/notifications/stream-ticket/; EventSource nie wysyła nagłówków).
+    Użytkownik jest brany z tokenu, więc czekający klienci nie odpytują bazy.
+    Wygaśnięcie i unieważnienie tokenu sprawdzane są co
+    NOTIFICATION_STREAM_RECHECK_SECONDS – wtedy strumień się kończy.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Strumień wymaga serwera ASGI."}, status=501)
+
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        try:
+            token = await sync_to_async(ContextAccessToken)(header[7:])
+        except TokenError:
+            return JsonResponse({"detail": "Nieprawidłowy token."}, status=401)
+        claims = token.payload
+        if not await sync_to_async(_stream_token_valid)(claims):
+            return JsonResponse({"detail": "Nieprawidłowy token."}, status=401)
+    elif request.GET.get("ticket"):
+        claims = await sync_to_async(redeem_stream_ticket)(request.GET["ticket"])
+        if claims is None or not await sync_to_async(_stream_token_valid)(claims):
+            return JsonResponse({"detail": "Nieprawidłowy lub zużyty bilet."}, status=401)
+    else:
+        return JsonResponse({"detail": "Brak tokenu."}, status=401)
+    # claim bywa zapisany jako tekst – broker indeksuje po PK w typie modelu
+    user_id = User._meta.pk.to_python(claims[api_settings.USER_ID_CLAIM])
+
+    unread = await Notification.objects.filter(user_id=user_id, is_read=False).acount()
+    response = StreamingHttpResponse(
+        _notification_events(user_id, unread, claims),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class TaskPriorityOptionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TaskPriorityOption.objects.all()
     serializer_class = TaskPriorityOptionSerializer
+    version_names = ('taskpriorityoption',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -277,9 +624,10 @@ class TaskPriorityOptionViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class TaskStatusOptionViewSet(viewsets.ModelViewSet):
+class TaskStatusOptionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TaskStatusOption.objects.all()
     serializer_class = TaskStatusOptionSerializer
+    version_names = ('taskstatusoption',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -289,17 +637,133 @@ class TaskStatusOptionViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
+class BootstrapView(ConditionalGetMixin, APIView):
+    """Wszystkie słowniki potrzebne app.html w jednej odpowiedzi (z ETagiem)."""
+    permission_classes = [permissions.IsAuthenticated]
+    version_names = ('team', 'category', 'taskstatusoption', 'taskpriorityoption')
+
+    def get(self, request):
+        return self.conditional_response(request, self.render_bootstrap)
+
+    def render_bootstrap(self):
+        teams = Team.objects.prefetch_related(
+            Prefetch('members', queryset=User.objects.only('id'))
+        )
+        return Response({
+            "teams": TeamSerializer(teams, many=True).data,
+            "categories": CategorySerializer(Category.objects.all(), many=True).data,
+            "statuses": TaskStatusOptionSerializer(TaskStatusOption.objects.all(), many=True).data,
+            "priorities": TaskPriorityOptionSerializer(TaskPriorityOption.objects.all(), many=True).data,
+        })
+
+
+class ExportView(APIView):
+    """Strumieniowy eksport `tasks` / `logs` jako CSV lub NDJSON (np. /api/export/logs.csv).
+
+    `?since=<ISO 8601>` i `?after_id=<id>` zawężają eksport do nowych wierszy;
+    nagłówek `X-Export-Watermark` podaje id, od którego zacząć następny raz.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, dataset, file_format):
+        if dataset not in export.EXPORTS or file_format not in export.FORMATS:
+            return Response({"detail": "Nieznany eksport."}, status=404)
+        try:
+            since, after_id = export.parse_watermarks(
+                request.query_params.get('since'), request.query_params.get('after_id')
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+
+        exporter, queryset, watermark = export.prepare_export(dataset, since, after_id)
+        content_type, render_lines = export.FORMATS[file_format]
+        response = StreamingHttpResponse(
+            render_lines(exporter.columns, export.iter_rows(exporter, queryset)),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{file_format}"'
+        if watermark is not None:
+            response['X-Export-Watermark'] = str(watermark)
+        return response
+
+
+class ImportView(APIView):
+    """Import zadań z pliku CSV / NDJSON, np. POST /api/import/tasks.csv.
+
+    Plik jako surowa treść żądania (np. `Content-Type: text/csv`) jest czytany
+    wiersz po wierszu w trakcie wysyłania. Pole `file` formularza multipart też
+    działa, ale Django odbiera wtedy cały plik (do pamięci lub pliku tymczasowego)
+    przed rozpoczęciem importu.
+
+    `?notify=rows|summary|none` – powiadomienia o każdym zadaniu, jedno na osobę albo żadne.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, file_format):
+        if file_format not in importer.READERS:
+            return Response({"detail": "Nieznany format importu."}, status=404)
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({"detail": "Brak pliku (pole 'file')."}, status=400)
+            lines = importer.text_stream(upload)
+        elif request.stream is not None:
+            # bez request.data – parser DRF wczytałby całą treść
+            lines = importer.text_lines(request.stream)
+        else:
+            return Response({"detail": "Brak pliku (treść żądania lub pole 'file')."}, status=400)
+        try:
+            task_importer = importer.TaskImporter(notify=request.query_params.get('notify', 'rows'))
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+
+        rows = importer.READERS[file_format](lines)
+        try:
+            task_importer.run(rows)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # wcześniejsze paczki są już zapisane – zwracamy też, ile ich było
+            return Response(
+                {"detail": f"Nie można odczytać pliku: {exc}", **task_importer.summary()},
+                status=400,
+            )
+        return Response(task_importer.summary())
+
+
+class TokenRevokeView(APIView):
+    """Wylogowanie: unieważnia bieżący token dostępu i podany `refresh`.
+
+    `?all=true` unieważnia wszystkie wydane dotąd tokeny użytkownika.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                refresh = ContextRefreshToken(raw_refresh)
+            except TokenError:
+                return Response({"detail": "Nieprawidłowy refresh token."}, status=400)
+            if User._meta.pk.to_python(refresh.get(api_settings.USER_ID_CLAIM)) != request.user.pk:
+                return Response({"detail": "Refresh token należy do innego użytkownika."}, status=400)
+            deny_token(refresh)
+        if request.auth is not None:
+            deny_token(request.auth)
+        if request.query_params.get('all') == 'true':
+            revoke_user_tokens(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CurrentUserInfoView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        profile = getattr(request.user, 'profile', None)
+        context = get_auth_context(request)
         return Response({
             "id": request.user.id,
             "username": request.user.username,
             "email": request.user.email,
-            "is_staff": request.user.is_staff,
-            "role": profile.role if profile else None,
+            "is_staff": context.is_staff,
+            "role": context.role,
         })
 
 
@@ -358,15 +822,8 @@ def google_auth_callback(request):
         state_obj.delete()
         return redirect("/?google=error")
 
-    creds = flow.credentials
-    creds_json = {
-        "token": creds.token,
-        "refresh_token": creds.refresh_token,
-        "token_uri": creds.token_uri,
-        "client_id": creds.client_id,
-        "client_secret": creds.client_secret,
-        "scopes": creds.scopes,
-    }
+    # razem z expiry – inaczej każdy klient odświeżałby token od nowa
+    creds_json = credentials_to_dict(flow.credentials)
 
     GoogleCredentials.objects.update_or_create(
         user=state_obj.user,
@@ -379,3 +836,17 @@ def google_auth_callback(request):
 def app_home(request):
     """Prosty interfejs testowy do wzywania endpointów API."""
     return render(request, "app.html")
+
+
+def metrics(request):
+    """Metryki żądań w formacie tekstowym Prometheusa (instrumentation.py).
+
+    Z ustawionym METRICS_TOKEN wymaga `Authorization: Bearer <token>`, bez niego – sesji staff.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}")
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(instrumentation.render_metrics(), content_type=instrumentation.CONTENT_TYPE)
@@ -74,7 +74,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tasks.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'tasks.middleware.CompressionMiddleware',
+    'tasks.middleware.WeakETagMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -106,8 +109,17 @@ WSGI_APPLICATION = 'teammanager.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Połączenia z PostgreSQL:
+#   - POSTGRES_CONN_MAX_AGE – ile sekund worker trzyma połączenie między żądaniami
+#     (0 – nowe połączenie na każde żądanie),
+#   - POSTGRES_CONN_HEALTH_CHECKS – sprawdzenie połączenia przed ponownym użyciem,
+#   - POSTGRES_POOL=true – natywna pula psycopg 3 (psycopg[pool]) zamiast trwałych
+#     połączeń; Django wymaga wtedy CONN_MAX_AGE = 0.
 POSTGRES_DB = os.environ.get("POSTGRES_DB")
+# repliki, z których czytają bezpieczne żądania (tasks/routers.py)
+DATABASE_REPLICAS = []
 if POSTGRES_DB:
+    POSTGRES_POOL = os.environ.get("POSTGRES_POOL", "false").lower() == "true"
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',
@@ -116,16 +128,65 @@ if POSTGRES_DB:
             'PASSWORD': os.environ.get("POSTGRES_PASSWORD", ""),
             'HOST': os.environ.get("POSTGRES_HOST", "localhost"),
             'PORT': os.environ.get("POSTGRES_PORT", "5432"),
+            'CONN_MAX_AGE': 0 if POSTGRES_POOL else int(os.environ.get("POSTGRES_CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': os.environ.get("POSTGRES_CONN_HEALTH_CHECKS", "true").lower() == "true",
+            'OPTIONS': {},
         }
     }
+    if POSTGRES_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 2)),
+            'max_size': int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 10)),
+            'timeout': float(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+        }
+    # Repliki do odczytu: POSTGRES_REPLICA_HOSTS=host1,host2:5433 – pozostałe
+    # parametry jak dla bazy głównej
+    for index, replica in enumerate(filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1):
+        host, _, port = replica.strip().partition(":")
+        DATABASES[f'replica{index}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(f'replica{index}')
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-        }
+        },
     }
 
+DATABASE_ROUTERS = ['tasks.routers.ReadReplicaRouter']
+# czas przypięcia użytkownika do bazy głównej po zapisie (opóźnienie replikacji)
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+
+
+# Cache – domyślnie w pamięci procesu; na produkcji współdzielony (np. Redis),
+# żeby unieważnienia (np. słowników statusów) docierały do wszystkich workerów
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", ""),
+    },
+    # odpowiedzi list/szczegółów zadań (tasks/response_cache.py)
+    'responses': {
+        'BACKEND': os.environ.get("RESPONSE_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("RESPONSE_CACHE_LOCATION", "tasks-responses"),
+    },
+}
+
+# Czy CACHE_BACKEND jest współdzielony przez wszystkie procesy (Redis, Memcached).
+# Tylko wtedy użytkownik i rola biorą się z claimów tokenu i cache (tasks/tokens.py,
+# tasks/authz.py); przy cache w pamięci procesu zmiana roli, dezaktywacja czy usunięcie
+# konta w jednym procesie nie byłyby widoczne w innych, więc każde żądanie czyta je z bazy.
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+AUTH_SHARED_CACHE = os.environ.get(
+    "AUTH_SHARED_CACHE", str(CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS)
+).lower() == "true"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -170,11 +231,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'tasks.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
 }
 
+# JSON API przez orjson (tasks/renderers.py; bez zainstalowanego orjson – zwykły json);
+# API_ORJSON=false przywraca klasy DRF
+if os.environ.get("API_ORJSON", "true").lower() == "true":
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'tasks.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'tasks.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
+# Tokeny z rolą i zespołem w claimach + lista unieważnień w cache (tasks/tokens.py).
+# Przy kilku procesach CACHE_BACKEND musi być współdzielony (np. Redis) – sprawdza to
+# `manage.py check --deploy` (tasks/checks.py), patrz też AUTH_SHARED_CACHE.
+SIMPLE_JWT = {
+    'AUTH_TOKEN_CLASSES': ('tasks.tokens.ContextAccessToken',),
+    'TOKEN_OBTAIN_SERIALIZER': 'tasks.tokens.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'tasks.tokens.TokenRefreshSerializer',
+}
+
 
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET", "")
@@ -186,3 +269,80 @@ GOOGLE_REDIRECT_URI = os.environ.get(
 GOOGLE_CALENDAR_SCOPES = [
     "https://www.googleapis.com/auth/calendar"
 ]
+
+# ile zbudowanych klientów Google Calendar trzymać w pamięci (na wątek)
+GOOGLE_SERVICE_CACHE_SIZE = int(os.environ.get("GOOGLE_SERVICE_CACHE_SIZE", 128))
+# ile wydarzeń wysyłać w jednym żądaniu batch do Google Calendar
+GOOGLE_CALENDAR_BATCH_SIZE = int(os.environ.get("GOOGLE_CALENDAR_BATCH_SIZE", 50))
+
+# Outbox e-maili / Google Calendar (manage.py run_outbox)
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 50))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_SECONDS = int(os.environ.get("OUTBOX_BACKOFF_SECONDS", 30))
+OUTBOX_MAX_BACKOFF_SECONDS = int(os.environ.get("OUTBOX_MAX_BACKOFF_SECONDS", 3600))
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", 300))
+
+# Strumień powiadomień SSE (/api/notifications/stream/, wymaga serwera ASGI)
+NOTIFICATION_BROKER = os.environ.get("NOTIFICATION_BROKER", "tasks.broker.InProcessBroker")
+NOTIFICATION_STREAM_KEEPALIVE = int(os.environ.get("NOTIFICATION_STREAM_KEEPALIVE", 25))
+# ważność jednorazowego biletu do strumienia i co ile sekund strumień sprawdza unieważnienie tokenu
+NOTIFICATION_STREAM_TICKET_SECONDS = int(os.environ.get("NOTIFICATION_STREAM_TICKET_SECONDS", 30))
+NOTIFICATION_STREAM_RECHECK_SECONDS = int(os.environ.get("NOTIFICATION_STREAM_RECHECK_SECONDS", 60))
+
+# Wyszukiwanie pełnotekstowe zadań (?q=): słownik PostgreSQL
+TASK_SEARCH_CONFIG = os.environ.get("TASK_SEARCH_CONFIG", "simple")
+
+# Eksport strumieniowy (/api/export/, manage.py export_tasks): wierszy na paczkę kursora
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+# o ile sekund watermark eksportu zostaje za najnowszymi wierszami (zapas na transakcje w toku)
+EXPORT_WATERMARK_OVERLAP_SECONDS = int(os.environ.get("EXPORT_WATERMARK_OVERLAP_SECONDS", 60))
+
+# Import zadań (/api/import/, manage.py import_tasks): wierszy na bulk_create/transakcję
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+
+# Kontekst autoryzacji (rola, zespół) w cache – czas życia wpisu w sekundach
+AUTH_CONTEXT_CACHE_TIMEOUT = int(os.environ.get("AUTH_CONTEXT_CACHE_TIMEOUT", 300))
+
+# Operacje zbiorcze (POST /api/tasks/bulk/): maksymalna liczba operacji w żądaniu
+TASK_BULK_MAX_OPERATIONS = int(os.environ.get("TASK_BULK_MAX_OPERATIONS", 2000))
+
+# Kompresja odpowiedzi (tasks/middleware.py): kodowania w kolejności preferencji
+# (np. "br,gzip" – br wymaga pakietu brotli; pusta wartość wyłącza), próg w bajtach, jakość brotli
+RESPONSE_COMPRESSION = [name.strip() for name in os.environ.get("RESPONSE_COMPRESSION", "gzip").split(",") if name.strip()]
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get("RESPONSE_COMPRESSION_BROTLI_QUALITY", 5))
+
+# Cache odpowiedzi GET /api/tasks/ i /api/tasks/<id>/ (sekundy; 0 – wyłączony)
+TASK_RESPONSE_CACHE_TIMEOUT = int(os.environ.get("TASK_RESPONSE_CACHE_TIMEOUT", 300))
+
+# Pomiary żądań (tasks/instrumentation.py): nagłówek Server-Timing, log
+# "tasks.requests" (logfmt; każde żądanie na INFO, wolniejsze niż SLOW_REQUEST_MS
+# na WARNING) i /metrics w formacie Prometheusa. Liczniki procesu trafiają do
+# cache co REQUEST_METRICS_FLUSH_SECONDS. Bez METRICS_TOKEN /metrics tylko dla staff.
+# Server-Timing ujawnia czasy SQL każdemu klientowi – domyślnie tylko z DEBUG.
+REQUEST_METRICS = os.environ.get("REQUEST_METRICS", "true").lower() == "true"
+SERVER_TIMING = os.environ.get("SERVER_TIMING", str(DEBUG)).lower() == "true"
+SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", 1000))
+REQUEST_METRICS_FLUSH_SECONDS = float(os.environ.get("REQUEST_METRICS_FLUSH_SECONDS", 10))
+REQUEST_METRICS_BUCKETS = sorted(
+    float(bound) for bound in os.environ.get(
+        "REQUEST_METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tasks.requests': {
+            'handlers': ['console'],
+            # w trybie deweloperskim tylko wolne żądania – runserver i tak loguje każde
+            'level': os.environ.get("REQUEST_LOG_LEVEL", "WARNING" if DEBUG else "INFO"),
+            'propagate': False,
+        },
+    },
+}